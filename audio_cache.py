@@ -0,0 +1,136 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+
+# trim() spares entries used this recently, which may belong to a run still
+# in progress in another process sharing the cache
+EVICT_GRACE_SECONDS = 3600
+
+
+def default_cache_dir():
+    """Per-user cache location shared by every run on this machine."""
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "language_slideshow_maker", "tts")
+
+
+def make_key(text, lang_code, provider, voice_id, speed):
+    """Stable digest of everything that changes the synthesized audio.
+    Unlike hash(), this is identical between processes and runs."""
+    payload = json.dumps([text, lang_code, provider, voice_id or "", float(speed)], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class AudioCache:
+    """
+    On-disk TTS cache keyed by make_key().
+    Files are written to a temp name and os.replace()d into place, so several
+    processes can share one directory. Once the directory grows past
+    max_bytes, trim() evicts the least recently used files (a hit refreshes
+    the file's mtime). Nothing is evicted while a run is using the cache:
+    callers trim() after the run, so paths they were handed stay valid.
+    """
+
+    def __init__(self, cache_dir=None, max_mb=500):
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._size = self._scan_size()
+
+    def path_for(self, key, ext=".mp3"):
+        return os.path.join(self.cache_dir, key + ext)
+
+    def get(self, key, ext=".mp3"):
+        """Returns the cached path for key, or None (and counts a miss)."""
+        path = self.path_for(key, ext)
+        try:
+            os.utime(path, None)
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return path
+
+    def contains(self, key, ext=".mp3"):
+        """Whether key is cached. Unlike get(), not counted as a hit or miss."""
+        return os.path.exists(self.path_for(key, ext))
+
+    def store(self, key, write_fn, ext=".mp3"):
+        """
+        Calls write_fn(tmp_path) to produce the file, then atomically moves it
+        into the cache. Returns the final path.
+        """
+        final_path = self.path_for(key, ext)
+        tmp_path = os.path.join(self.cache_dir, f".{key}.{uuid.uuid4().hex}.tmp{ext}")
+        try:
+            write_fn(tmp_path)
+            size = os.path.getsize(tmp_path)
+            os.replace(tmp_path, final_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        with self._lock:
+            self._size += size
+        return final_path
+
+    def trim(self, grace_seconds=EVICT_GRACE_SECONDS):
+        """Evicts if the cache has grown past max_bytes. Call between runs, not during one."""
+        with self._lock:
+            over_limit = self._size > self.max_bytes
+        if over_limit:
+            self.evict(grace_seconds)
+
+    def evict(self, grace_seconds=0):
+        """
+        Deletes least recently used entries until the cache fits max_bytes.
+        Entries used within the last grace_seconds are kept even if the cache
+        stays over its limit.
+        """
+        cutoff = time.time() - grace_seconds
+        with self._lock:
+            entries = []
+            total = 0
+            for entry in os.scandir(self.cache_dir):
+                # Skip in-flight writes from this or other processes
+                if entry.name.startswith(".") or not entry.is_file():
+                    continue
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, entry.path))
+                total += st.st_size
+
+            entries.sort()
+            for mtime, size, path in entries:
+                if total <= self.max_bytes or mtime > cutoff:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                except OSError:
+                    # Already removed by another process
+                    pass
+            self._size = total
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size_bytes": self._size}
+
+    def _scan_size(self):
+        total = 0
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_file() and not entry.name.startswith("."):
+                try:
+                    total += entry.stat().st_size
+                except OSError:
+                    pass
+        return total
@@ -0,0 +1,163 @@
+import subprocess
+import threading
+import wave
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from moviepy.config import FFMPEG_BINARY
+import video_encoder
+
+# 48 kHz divides evenly into 24 fps frames (2000 samples each)
+SAMPLE_RATE = 48000
+
+
+def decode(path, sample_rate=SAMPLE_RATE):
+    """Decodes an audio file to mono float32 PCM."""
+    cmd = [FFMPEG_BINARY, "-hide_banner", "-loglevel", "error", "-i", path,
+           "-f", "s16le", "-acodec", "pcm_s16le", "-ac", "1", "-ar", str(sample_rate), "-"]
+    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        raise RuntimeError(f"Could not decode {path}: {result.stderr.decode(errors='replace').strip()}")
+    return np.frombuffer(result.stdout, dtype=np.int16).astype(np.float32) / 32768.0
+
+
+class PcmCache:
+    """Decoded clips, least recently used dropped past max_bytes."""
+
+    def __init__(self, max_mb=256):
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self._items = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, path):
+        with self._lock:
+            pcm = self._items.get(path)
+            if pcm is not None:
+                self._items.move_to_end(path)
+            return pcm
+
+    def put(self, path, pcm):
+        with self._lock:
+            if path in self._items:
+                return
+            self._items[path] = pcm
+            self._size += pcm.nbytes
+            while self._size > self.max_bytes and len(self._items) > 1:
+                _, old = self._items.popitem(last=False)
+                self._size -= old.nbytes
+
+
+class TimelineWriter:
+    """
+    Writes a 16-bit mono WAV from clips placed at exact sample offsets.
+    Only one chunk of chunk_seconds is held in memory; it is flushed to disk
+    as the timeline moves past it, so long decks use constant memory.
+    """
+
+    def __init__(self, output_path, sample_rate=SAMPLE_RATE, chunk_seconds=60):
+        self.sample_rate = sample_rate
+        self._wav = wave.open(output_path, "wb")
+        self._wav.setnchannels(1)
+        self._wav.setsampwidth(2)
+        self._wav.setframerate(sample_rate)
+        self._buffer = np.zeros(int(chunk_seconds * sample_rate), dtype=np.float32)
+        self._start = 0 # timeline sample at _buffer[0]
+        self._end = 0 # timeline length so far
+
+    def add_span(self, length, clips):
+        """
+        Appends length samples of silence with clips mixed in.
+        clips: list of (offset within the span, pcm).
+        """
+        span_end = self._end + length
+        if span_end - self._start > len(self._buffer):
+            self._flush(self._end)
+        if length > len(self._buffer):
+            # Longer than a whole chunk: mix it separately
+            span = np.zeros(length, dtype=np.float32)
+            for offset, pcm in clips:
+                pcm = pcm[:max(0, length - offset)]
+                span[offset:offset + len(pcm)] += pcm
+            self._write(span)
+            self._start = self._end = span_end
+            return
+
+        base = self._end - self._start
+        for offset, pcm in clips:
+            pcm = pcm[:max(0, length - offset)]
+            self._buffer[base + offset:base + offset + len(pcm)] += pcm
+        self._end = span_end
+
+    def close(self):
+        self._flush(self._end)
+        self._wav.close()
+
+    def _flush(self, upto):
+        n = upto - self._start
+        if n > 0:
+            self._write(self._buffer[:n])
+            self._buffer[:n] = 0
+        self._start = upto
+
+    def _write(self, samples):
+        pcm = np.clip(samples, -1.0, 1.0)
+        self._wav.writeframes((pcm * 32767).astype("<i2").tobytes())
+
+
+def _decode_ahead(paths, cache, sample_rate, workers=4, lookahead=16):
+    """Yields decoded PCM for paths in order, decoding a few clips ahead in threads."""
+    def load(path):
+        pcm = cache.get(path)
+        if pcm is None:
+            pcm = decode(path, sample_rate)
+            cache.put(path, pcm)
+        return pcm
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        it = iter(paths)
+        for path in it:
+            pending.append(pool.submit(load, path))
+            if len(pending) >= lookahead:
+                break
+        while pending:
+            yield pending.popleft().result()
+            for path in it:
+                pending.append(pool.submit(load, path))
+                break
+
+
+def build_track(pairs, output_path, sentence_pause, slide_pause, fps=None,
+                sample_rate=SAMPLE_RATE, cache_mb=256):
+    """
+    Lays out every slide's audio as: clip 1, sentence_pause, clip 2, slide_pause.
+    pairs: list of (audio1_path, audio2_path), one per slide.
+    Writes one WAV to output_path and returns each slide's duration in seconds.
+    With fps, slide durations are rounded up to whole frames (see
+    video_encoder.quantize_duration) and the audio follows the same boundaries.
+    """
+    cache = PcmCache(cache_mb)
+    writer = TimelineWriter(output_path, sample_rate)
+    durations = []
+    elapsed = 0.0 # seconds
+    written = 0 # samples
+
+    try:
+        decoded = _decode_ahead((path for pair in pairs for path in pair), cache, sample_rate)
+        for pcm1 in decoded:
+            pcm2 = next(decoded)
+            offset2 = len(pcm1) + int(round(sentence_pause * sample_rate))
+            duration = (offset2 + len(pcm2)) / sample_rate + slide_pause
+            if fps:
+                duration = video_encoder.quantize_duration(duration, fps)
+            durations.append(duration)
+
+            # Slide boundaries come from the running total, so rounding never drifts
+            elapsed += duration
+            end = int(round(elapsed * sample_rate))
+            writer.add_span(end - written, [(0, pcm1), (offset2, pcm2)])
+            written = end
+    finally:
+        writer.close()
+    return durations
@@ -0,0 +1,240 @@
+"""
+Headless batch mode: renders many decks in one long-lived process, so fonts,
+background plates, TTS clients, render workers and caches stay warm.
+
+    python batch.py decks/ --output-dir out/ --set tts_speed=1.2 --workers 2
+    python batch.py nightly.json
+
+Inputs are deck files, directories of decks, or JSON manifests:
+
+    {
+        "settings": {"video_engine": "ffmpeg"},
+        "decks": [
+            "lesson1.xlsx",
+            {"input": "lesson2.csv", "output": "out/l2.mp4",
+             "lang1": "English", "lang2": "Japanese", "settings": {"tts_speed": 0.9}}
+        ]
+    }
+
+Relative paths in a manifest are relative to the manifest. Settings are
+applied in order: saved config (--config), manifest settings, --set, per-deck
+settings.
+"""
+import argparse
+import json
+import multiprocessing.util
+import os
+import sys
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from config_manager import CONFIG_FILE, ConfigManager
+import deck_loader
+from logic import SlideshowConfig, SlideshowGenerator
+from slides import worker_context
+
+# Warm generators by settings, most recently used last. Each owns a render
+# pool, provider clients and a workspace, so only a few are kept per process.
+MAX_GENERATORS = 2
+_generators = OrderedDict()
+
+
+def parse_value(text):
+    """--set value: JSON if it parses (numbers, booleans, lists), otherwise a plain string."""
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+
+def parse_overrides(pairs):
+    overrides = {}
+    for pair in pairs:
+        key, sep, value = pair.partition("=")
+        if not sep or not key:
+            raise argparse.ArgumentTypeError(f"Expected KEY=VALUE, got '{pair}'")
+        overrides[key.strip()] = parse_value(value)
+    return overrides
+
+
+def is_deck(path):
+    name = os.path.basename(path)
+    # "~$" files are Excel lock files
+    return name.lower().endswith(deck_loader.SUPPORTED_EXTENSIONS) and not name.startswith("~$")
+
+
+def default_output(input_path, output_dir):
+    name = os.path.splitext(os.path.basename(input_path))[0] + "_slideshow.mp4"
+    return os.path.join(output_dir or os.path.dirname(input_path), name)
+
+
+def _manifest_jobs(manifest_path, base_settings, overrides, output_dir):
+    with open(manifest_path, "r") as f:
+        manifest = json.load(f)
+    if isinstance(manifest, list):
+        manifest = {"decks": manifest}
+    root = os.path.dirname(os.path.abspath(manifest_path))
+    settings = {**base_settings, **manifest.get("settings", {}), **overrides}
+
+    jobs = []
+    for entry in manifest.get("decks", []):
+        if isinstance(entry, str):
+            entry = {"input": entry}
+        input_path = os.path.join(root, entry["input"])
+        output = entry.get("output")
+        output = os.path.join(root, output) if output else default_output(input_path, output_dir)
+        jobs.append(_job(input_path, output, {**settings, **entry.get("settings", {})},
+                         entry.get("lang1"), entry.get("lang2")))
+    return jobs
+
+
+def _job(input_path, output_path, settings, lang1=None, lang2=None):
+    return {
+        "input": input_path,
+        "output": output_path,
+        "lang1": lang1 or settings.get("lang1", "English"),
+        "lang2": lang2 or settings.get("lang2", "French"),
+        "settings": settings,
+    }
+
+
+def collect_jobs(inputs, base_settings, overrides, output_dir=None):
+    """Expands deck files, directories and manifests into a list of jobs."""
+    settings = {**base_settings, **overrides}
+    jobs = []
+    for path in inputs:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                deck = os.path.join(path, name)
+                if os.path.isfile(deck) and is_deck(deck):
+                    jobs.append(_job(deck, default_output(deck, output_dir), settings))
+        elif path.lower().endswith(".json"):
+            jobs.extend(_manifest_jobs(path, base_settings, overrides, output_dir))
+        elif is_deck(path):
+            jobs.append(_job(path, default_output(path, output_dir), settings))
+        else:
+            raise ValueError(f"Not a deck, directory or manifest: {path}")
+    return jobs
+
+
+def _generator_for(settings):
+    key = json.dumps(settings, sort_keys=True, default=str)
+    gen = _generators.get(key)
+    if gen is not None:
+        _generators.move_to_end(key)
+        return gen
+    while len(_generators) >= MAX_GENERATORS:
+        _, old = _generators.popitem(last=False)
+        old.close()
+    gen = _generators[key] = SlideshowGenerator(SlideshowConfig.from_dict(settings))
+    return gen
+
+
+def close_generators():
+    while _generators:
+        _, gen = _generators.popitem()
+        gen.close()
+
+
+def run_job(job, verbose=False):
+    """Renders one deck with a warm generator. Returns (output path, seconds)."""
+    gen = _generator_for(job["settings"])
+    name = os.path.basename(job["input"])
+    start = time.perf_counter()
+
+    def progress(p, msg):
+        if verbose:
+            print(f"[{name}] {int(p*100)}%: {msg}", flush=True)
+
+    out_dir = os.path.dirname(job["output"])
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+    gen.create_video(gen.stream_deck(job["input"]), job["lang1"], job["lang2"], job["output"], progress)
+    if verbose:
+        print(f"[{name}] Timings:\n{gen.last_trace.summary_table()}", flush=True)
+    return job["output"], time.perf_counter() - start
+
+
+def _worker_init():
+    # Pool workers leave through multiprocessing, which skips atexit but runs finalizers
+    multiprocessing.util.Finalize(None, close_generators, exitpriority=10)
+
+
+def run_batch(jobs, workers=1, verbose=False):
+    """
+    Runs every job, on workers processes that each keep their generators warm.
+    A failed deck does not stop the batch. Returns {input path: error} for failures.
+    """
+    failures = {}
+
+    def report(job, result=None, error=None):
+        if error is not None:
+            failures[job["input"]] = error
+            print(f"FAILED {job['input']}: {error}", flush=True)
+        else:
+            output, seconds = result
+            print(f"OK {job['input']} -> {output} ({seconds:.1f}s)", flush=True)
+
+    if workers <= 1:
+        try:
+            for job in jobs:
+                try:
+                    report(job, run_job(job, verbose))
+                except Exception as e:
+                    report(job, error=e)
+        finally:
+            close_generators()
+        return failures
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=worker_context(),
+                             initializer=_worker_init) as pool:
+        futures = {pool.submit(run_job, job, verbose): job for job in jobs}
+        for future in as_completed(futures):
+            try:
+                report(futures[future], future.result())
+            except Exception as e:
+                report(futures[future], error=e)
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render slideshow videos for many decks without the GUI.")
+    parser.add_argument("inputs", nargs="+", help="deck files, directories of decks, or JSON manifests")
+    parser.add_argument("-o", "--output-dir", help="where videos go (default: next to each deck)")
+    parser.add_argument("--config", default=CONFIG_FILE, help="saved settings to start from (default: %(default)s)")
+    parser.add_argument("--set", dest="overrides", action="append", default=[], metavar="KEY=VALUE",
+                        help="override a setting, e.g. --set tts_speed=1.2 (repeatable)")
+    parser.add_argument("-w", "--workers", type=int, default=1,
+                        help="decks rendered in parallel, one process each (default: %(default)s)")
+    parser.add_argument("--skip-existing", action="store_true", help="skip decks whose video already exists")
+    parser.add_argument("-v", "--verbose", action="store_true", help="print per-deck progress")
+    args = parser.parse_args(argv)
+
+    try:
+        overrides = parse_overrides(args.overrides)
+    except argparse.ArgumentTypeError as e:
+        parser.error(str(e))
+
+    base_settings = ConfigManager.load_config(args.config)
+    if args.workers > 1:
+        # Decks already run in parallel; rendering and encoding each deck in one
+        # process avoids oversubscribing the CPUs
+        overrides.setdefault("render_workers", 1)
+        overrides.setdefault("encode_workers", 1)
+
+    jobs = collect_jobs(args.inputs, base_settings, overrides, args.output_dir)
+    if args.skip_existing:
+        jobs = [job for job in jobs if not os.path.exists(job["output"])]
+    if not jobs:
+        print("Nothing to do.")
+        return 0
+
+    print(f"Rendering {len(jobs)} deck(s) with {args.workers} worker(s)...", flush=True)
+    start = time.perf_counter()
+    failures = run_batch(jobs, args.workers, args.verbose)
+    print(f"{len(jobs) - len(failures)}/{len(jobs)} decks done in {time.perf_counter() - start:.1f}s")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,458 @@
+"""
+Performance benchmarks for wrapping, slide rendering, audio assembly, tempo
+changes, the whole create_video pipeline and the moviepy engine's peak
+memory and open files by deck size, plus a check that chunked encodes
+match a single-pass encode frame for frame. No network access is needed:
+speech comes from the "offline" TTS provider, which writes tones whose
+length follows the text.
+
+    python benchmark.py -o before.json
+    python benchmark.py -o after.json --compare before.json
+    python benchmark.py --quick
+
+Results are JSON: environment info plus one entry per benchmark with its
+parameters and timing statistics (seconds).
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from moviepy.config import FFMPEG_BINARY
+from PIL import Image
+import audio_timeline
+import fonts
+import synthesis
+import tempo
+import utils
+import video_encoder
+from logic import SlideshowConfig, SlideshowGenerator
+
+LATIN_WORDS = ("the quick brown fox jumps over a lazy dog while seven happy students "
+               "practice their new vocabulary every morning before breakfast").split()
+CJK_CHARS = "我们今天学习新的汉字和句子这是一个很好的练习日本語の文章を読みますか"
+
+# script: (words per sentence range, joiner)
+SCRIPTS = {
+    "latin": ((4, 10), " "),
+    "cjk": ((8, 20), ""),
+    "long": ((40, 70), " "),
+}
+# How much streaming assembly's encode-stage RSS growth and peak open files
+# may rise from the smallest to the largest deck and still count as flat
+FLAT_RSS_TOLERANCE_MB = 25
+FLAT_FILES_TOLERANCE = 4
+RESOLUTIONS = {"720p": (1280, 720), "1080p": (1920, 1080), "4k": (3840, 2160)}
+
+
+def sentence(rng, script):
+    (low, high), joiner = SCRIPTS[script]
+    pool = CJK_CHARS if script == "cjk" else LATIN_WORDS
+    return joiner.join(rng.choice(pool) for _ in range(rng.randint(low, high)))
+
+
+def make_deck(script, rows, seed=0):
+    """Synthetic deck: text1 in the given script, text2 always Latin."""
+    rng = random.Random(seed)
+    return [{'text1': sentence(rng, script), 'text2': sentence(rng, "latin")} for _ in range(rows)]
+
+
+def tone(seconds, path, frequency=440):
+    subprocess.run([FFMPEG_BINARY, "-y", "-hide_banner", "-loglevel", "error",
+                    "-f", "lavfi", "-i", f"sine=frequency={frequency}:duration={seconds:.3f}",
+                    "-ac", "1", "-ar", "24000", path], check=True)
+
+
+def measure(fn, repeat):
+    """Runs fn repeat times; returns timing stats in seconds."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return {
+        "repeat": repeat,
+        "min": min(times),
+        "median": statistics.median(times),
+        "mean": statistics.fmean(times),
+        "max": max(times),
+    }
+
+
+def bench_wrap(results, scripts, repeat):
+    font = fonts.get_font("Arial", 60)
+    for script in scripts:
+        deck = make_deck(script, 200)
+
+        def run():
+            for item in deck:
+                utils.wrap_text(item['text1'], font, 1720)
+
+        results.append(("wrap_text", {"script": script, "sentences": len(deck)}, measure(run, repeat)))
+
+
+def bench_slides(results, scripts, resolutions, repeat):
+    for res_name in resolutions:
+        config = SlideshowConfig()
+        config.output_resolution = RESOLUTIONS[res_name]
+        gen = SlideshowGenerator(config)
+        try:
+            for script in scripts:
+                deck = make_deck(script, 10)
+                gen.generate_slide(deck[0]['text1'], deck[0]['text2']) # warm font and plate caches
+
+                def run():
+                    for item in deck:
+                        gen.generate_slide(item['text1'], item['text2'])
+
+                results.append(("generate_slide", {"script": script, "resolution": res_name,
+                                                   "slides": len(deck)}, measure(run, repeat)))
+        finally:
+            gen.close()
+
+
+def bench_audio(results, sizes, repeat, work_dir):
+    clips = []
+    for n in range(20):
+        path = os.path.join(work_dir, f"clip_{n}.mp3")
+        tone(0.8 + 0.1 * n, path, 300 + 20 * n)
+        clips.append(path)
+    out = os.path.join(work_dir, "track.wav")
+
+    for rows in sizes:
+        pairs = [(clips[i % len(clips)], clips[(i * 7 + 3) % len(clips)]) for i in range(rows)]
+        results.append(("build_track", {"slides": rows},
+                        measure(lambda: audio_timeline.build_track(pairs, out, 0.5, 0.5, fps=24), repeat)))
+
+    pairs = [(path, path[:-len(".mp3")] + "_fast.mp3") for path in clips]
+    results.append(("stretch_many", {"clips": len(pairs), "speed": 1.25},
+                    measure(lambda: tempo.stretch_many(pairs, 1.25), repeat)))
+    # The unbatched path: one ffmpeg atempo process per clip
+    results.append(("stretch_per_clip", {"clips": len(pairs), "speed": 1.25},
+                    measure(lambda: tempo.stretch_many(pairs, 1.25, batch_size=1), repeat)))
+
+
+def bench_synthesis(results, sizes, concurrency_levels, repeat, work_dir, tts_latency_ms):
+    """Synthesis pre-pass alone, against the offline provider with a cold cache."""
+    for rows in sizes:
+        jobs = synthesis.collect_jobs(make_deck("latin", rows, seed=1), "English", "French")
+        for concurrency in concurrency_levels:
+            config = SlideshowConfig()
+            config.tts_provider = "offline"
+            config.offline_tts_latency_ms = tts_latency_ms
+            config.offline_tts_jitter_ms = tts_latency_ms / 3
+            config.tts_concurrency = concurrency
+
+            def run():
+                config.audio_cache_dir = tempfile.mkdtemp(dir=work_dir)
+                gen = SlideshowGenerator(config)
+                try:
+                    synthesis.run_jobs(gen, jobs, concurrency)
+                finally:
+                    gen.close()
+                    shutil.rmtree(config.audio_cache_dir, ignore_errors=True)
+
+            stats = measure(run, repeat)
+            stats["clips_per_second"] = len(jobs) / stats["median"]
+            results.append(("synthesis", {"clips": len(jobs), "concurrency": concurrency,
+                                          "tts_latency_ms": tts_latency_ms}, stats))
+
+
+def bench_create_video(results, scripts, sizes, engines, repeat, work_dir, tts_latency_ms):
+    for engine in engines:
+        for script in scripts:
+            for rows in sizes:
+                deck = make_deck(script, rows)
+                params = {"engine": engine, "script": script, "slides": rows, "resolution": "720p",
+                          "tts_latency_ms": tts_latency_ms}
+                for cache in ("cold", "warm"):
+                    cache_dir = os.path.join(work_dir, f"cache_{engine}_{script}_{rows}")
+                    if cache == "cold":
+                        shutil.rmtree(cache_dir, ignore_errors=True)
+
+                    def run():
+                        config = SlideshowConfig()
+                        config.output_resolution = RESOLUTIONS["720p"]
+                        config.video_engine = engine
+                        config.audio_cache_dir = cache_dir
+                        config.tts_provider = "offline"
+                        config.offline_tts_latency_ms = tts_latency_ms
+                        config.offline_tts_jitter_ms = tts_latency_ms / 3
+                        gen = SlideshowGenerator(config)
+                        try:
+                            gen.create_video(deck, "English", "French", os.path.join(work_dir, "out.mp4"))
+                        finally:
+                            gen.close()
+
+                    # A cold run fills the cache, so it can only be measured once
+                    stats = measure(run, 1 if cache == "cold" else repeat)
+                    results.append(("create_video", {**params, "audio_cache": cache}, stats))
+
+
+def process_usage():
+    """(RSS in MB, open file descriptors) of this process, or (None, None) where /proc is not available."""
+    try:
+        with open("/proc/self/statm") as f:
+            rss = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+        return rss, len(os.listdir("/proc/self/fd"))
+    except (OSError, ValueError):
+        return None, None
+
+
+def memory_probe(rows, stream_assembly, work_dir):
+    """
+    One moviepy-engine create_video, run in a fresh process by bench_memory.
+    Returns its time and peak RSS (MB), how far RSS rose above its level at
+    the start of the encode stage, and the most file descriptors open at once.
+    Returns None where peak RSS cannot be read (Windows).
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    deck = make_deck("latin", rows)
+    config = SlideshowConfig()
+    config.output_resolution = RESOLUTIONS["720p"]
+    config.video_engine = "moviepy"
+    config.stream_assembly = stream_assembly
+    config.render_workers = 1 # keep rendering in this process, so it is measured
+    config.audio_cache_dir = os.path.join(work_dir, "cache_memory")
+    config.tts_provider = "offline"
+    config.offline_tts_latency_ms = 0
+    config.offline_tts_jitter_ms = 0
+
+    samples = [] # (perf_counter, rss_mb, open_files)
+    stop = threading.Event()
+
+    def sample():
+        while not stop.wait(0.005):
+            rss, fds = process_usage()
+            if rss is not None:
+                samples.append((time.perf_counter(), rss, fds))
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    gen = SlideshowGenerator(config)
+    start = time.perf_counter()
+    try:
+        gen.create_video(deck, "English", "French", os.path.join(work_dir, f"memory_{rows}.mp4"))
+    finally:
+        elapsed = time.perf_counter() - start
+        gen.close()
+        stop.set()
+        sampler.join()
+    # ru_maxrss is in KB on Linux and bytes on macOS
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+    encode_growth = peak_fds = None
+    if samples:
+        peak_fds = max(fds for _, _, fds in samples)
+        encode = next(span for span in gen.last_trace.spans() if span["name"] == "encode")
+        before = [rss for t, rss, _ in samples if t <= encode["start"]]
+        during = [rss for t, rss, _ in samples if encode["start"] <= t <= encode["start"] + encode["duration"]]
+        if before and during:
+            encode_growth = max(during) - before[-1]
+    return elapsed, peak_rss, encode_growth, peak_fds
+
+
+def bench_memory(results, sizes, work_dir):
+    """
+    Memory and open files of the moviepy engine against deck size, with and
+    without stream_assembly. Each run gets a fresh process so its peak is its
+    own. With streaming assembly the encode stage's growth and the open files
+    should stay flat as the deck grows; returns a message for each that does not.
+    """
+    context = multiprocessing.get_context("spawn")
+    streaming = []
+    for stream_assembly in (True, False):
+        for rows in sizes:
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                probe = pool.submit(memory_probe, rows, stream_assembly, work_dir).result()
+            if probe is None:
+                print("Skipping the memory benchmark: peak RSS is not available on this platform")
+                return []
+            elapsed, peak_rss, encode_growth, peak_fds = probe
+            if stream_assembly:
+                streaming.append((rows, encode_growth, peak_fds))
+            stats = {"repeat": 1, "min": elapsed, "median": elapsed, "mean": elapsed, "max": elapsed,
+                     "peak_rss_mb": peak_rss, "encode_rss_growth_mb": encode_growth, "peak_open_files": peak_fds}
+            results.append(("moviepy_memory", {"slides": rows, "stream_assembly": stream_assembly,
+                                               "resolution": "720p"}, stats))
+            growth = "n/a" if encode_growth is None else f"{encode_growth:.0f} MB"
+            print(f"moviepy stream_assembly={stream_assembly}, {rows} slides: peak RSS {peak_rss:.0f} MB, "
+                  f"encode stage +{growth}, peak open files {peak_fds}")
+
+    failures = []
+    (rows_a, growth_a, fds_a), (rows_b, growth_b, fds_b) = streaming[0], streaming[-1]
+    if growth_a is not None and growth_b is not None and growth_b - growth_a > FLAT_RSS_TOLERANCE_MB:
+        failures.append(f"streaming encode-stage RSS growth rose from {growth_a:.0f} MB at {rows_a} slides "
+                        f"to {growth_b:.0f} MB at {rows_b} slides")
+    if fds_a is not None and fds_b is not None and fds_b - fds_a > FLAT_FILES_TOLERANCE:
+        failures.append(f"streaming peak open files rose from {fds_a} at {rows_a} slides to {fds_b} at {rows_b} slides")
+    return failures
+
+
+def frame_times(path):
+    """(pts seconds, is keyframe) of every video frame in path, in decode order."""
+    result = subprocess.run([FFMPEG_BINARY, "-hide_banner", "-i", path, "-map", "0:v", "-vf", "showinfo",
+                             "-f", "null", "-"], capture_output=True, text=True)
+    return [(float(pts), key == "1") for pts, key in re.findall(r"pts_time:(\S+).*?iskey:(\d)", result.stderr)]
+
+
+def check_chunked_encode(results, work_dir, slides=12, chunk_rows=5):
+    """
+    Encodes one slideshow in a single pass and in parallel chunks stitched by
+    concat_segments, and compares their frames. Chunks add one non-key frame
+    before each chunk's end (it pins the chunk's length), but every slide
+    must start on a keyframe at the same time, timestamps must only go
+    forward, and the video must end where the single pass does.
+    Returns a message for each mismatch.
+    """
+    fps = video_encoder.FPS
+    still_slides = []
+    for i in range(slides):
+        path = os.path.join(work_dir, f"check_slide_{i}.png")
+        Image.new("RGB", (320, 180), (20 * i % 256, 80, 160)).save(path)
+        still_slides.append((path, video_encoder.quantize_duration(1.3 + 0.37 * (i % 7))))
+    audio_path = os.path.join(work_dir, "check_audio.wav")
+    tone(sum(duration for _, duration in still_slides), audio_path)
+
+    single = os.path.join(work_dir, "check_single.mp4")
+    chunked = os.path.join(work_dir, "check_chunked.mp4")
+    ranges = video_encoder.chunk_ranges([duration for _, duration in still_slides], rows=chunk_rows)
+
+    def encode_chunked():
+        chunks = video_encoder.encode_chunks(still_slides, ranges, work_dir)
+        video_encoder.concat_segments(chunks, audio_path, chunked, work_dir)
+
+    params = {"slides": slides, "chunk_rows": chunk_rows}
+    results.append(("encode_single_pass", params,
+                    measure(lambda: video_encoder.encode_slideshow(still_slides, audio_path, single, work_dir), 1)))
+    results.append(("encode_chunked", params, measure(encode_chunked, 1)))
+
+    expected, actual = frame_times(single), frame_times(chunked)
+
+    failures = []
+    expected_keys = [round(pts * fps) for pts, key in expected if key]
+    actual_keys = [round(pts * fps) for pts, key in actual if key]
+    if actual_keys != expected_keys:
+        failures.append(f"chunked keyframes at frames {actual_keys}, single pass at {expected_keys}")
+    times = [pts for pts, _ in actual]
+    if any(b <= a for a, b in zip(times, times[1:])):
+        failures.append("chunked frame timestamps go backwards")
+    if times and expected and abs(times[-1] - expected[-1][0]) > 1.5 / fps:
+        failures.append(f"chunked video ends at {times[-1]:.3f}s, single pass at {expected[-1][0]:.3f}s")
+    return failures
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "commit": commit or None,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def bench_key(entry):
+    return entry["name"] + " " + json.dumps(entry["params"], sort_keys=True)
+
+
+def compare(current, baseline_path):
+    """Prints the median of each benchmark next to the baseline's."""
+    with open(baseline_path, "r") as f:
+        baseline = {bench_key(e): e for e in json.load(f)["results"]}
+    print(f"\n{'benchmark':<80} {'before':>9} {'after':>9} {'change':>8}")
+    for entry in current["results"]:
+        old = baseline.get(bench_key(entry))
+        if not old:
+            continue
+        before, after = old["stats"]["median"], entry["stats"]["median"]
+        change = (after - before) / before * 100 if before else 0.0
+        print(f"{bench_key(entry):<80} {before:>9.4f} {after:>9.4f} {change:>+7.1f}%")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the slideshow pipeline (no network needed).")
+    parser.add_argument("-o", "--output", help="write results as JSON to this file")
+    parser.add_argument("--compare", metavar="BASELINE", help="compare with an earlier results file")
+    parser.add_argument("--quick", action="store_true", help="small sizes and one repeat, for a smoke test")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 50], help="deck sizes (rows)")
+    parser.add_argument("--scripts", nargs="+", choices=sorted(SCRIPTS), default=sorted(SCRIPTS))
+    parser.add_argument("--resolutions", nargs="+", choices=list(RESOLUTIONS), default=["720p", "1080p"])
+    parser.add_argument("--engines", nargs="+", choices=["ffmpeg", "moviepy"], default=["ffmpeg"])
+    parser.add_argument("--tts-latency-ms", type=float, default=0,
+                        help="simulated TTS round trip for create_video (default: %(default)s)")
+    parser.add_argument("--synthesis-latency-ms", type=float, default=150,
+                        help="simulated TTS round trip for the synthesis benchmark (default: %(default)s)")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16],
+                        help="tts_concurrency values for the synthesis benchmark")
+    parser.add_argument("--memory-sizes", type=int, nargs="+", default=[25, 100],
+                        help="deck sizes (rows) for the moviepy memory benchmark")
+    parser.add_argument("--only", nargs="+",
+                        choices=["wrap", "slides", "audio", "synthesis", "video", "chunks", "memory"],
+                        default=["wrap", "slides", "audio", "synthesis", "video", "chunks", "memory"])
+    args = parser.parse_args(argv)
+    if args.quick:
+        args.repeat, args.sizes, args.memory_sizes = 1, [5], [5, 20]
+
+    results = []
+    failures = []
+    work_dir = tempfile.mkdtemp(prefix="bench_slideshow_")
+    try:
+        if "wrap" in args.only:
+            bench_wrap(results, args.scripts, args.repeat)
+        if "slides" in args.only:
+            bench_slides(results, args.scripts, args.resolutions, args.repeat)
+        if "audio" in args.only:
+            bench_audio(results, args.sizes, args.repeat, work_dir)
+        if "synthesis" in args.only:
+            bench_synthesis(results, args.sizes, args.concurrency, args.repeat, work_dir,
+                            args.synthesis_latency_ms)
+        if "video" in args.only:
+            bench_create_video(results, args.scripts, args.sizes, args.engines, args.repeat, work_dir,
+                               args.tts_latency_ms)
+        if "chunks" in args.only:
+            failures += check_chunked_encode(results, work_dir)
+        if "memory" in args.only:
+            failures += bench_memory(results, args.memory_sizes, work_dir)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {
+        "environment": environment(),
+        "results": [{"name": name, "params": params, "stats": stats} for name, params, stats in results],
+        "failures": failures,
+    }
+    for entry in report["results"]:
+        print(f"{bench_key(entry):<80} median {entry['stats']['median']:.4f}s")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+    if args.compare:
+        compare(report, args.compare)
+    for failure in failures:
+        print(f"FAILED: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,7 +5,7 @@ CONFIG_FILE = "config.json"
 
 class ConfigManager:
     @staticmethod
-    def load_config():
+    def load_config(path=CONFIG_FILE):
         default_config = {
             "font_size": 60,
             "font_name": "Arial",
@@ -18,13 +18,47 @@ class ConfigManager:
             "tts_voice_id_2": "",
             "tts_speed": 1.0,
             "bg_image_path": "",
+            "audio_cache_dir": "",
+            "audio_cache_max_mb": 500,
+            "tts_concurrency": 4,
+            "tts_client_pool_size": 1,
+            "tts_rate_limit": 0,
+            "tts_max_retries": 4,
+            "tts_fallback_to_gtts": True,
+            "render_workers": 0,
+            "video_engine": "ffmpeg",
+            "stream_assembly": True,
+            "constant_frame_rate": False,
+            "incremental_segments": False,
+            "encode_chunk_rows": 0,
+            "encode_chunk_seconds": 0,
+            "encode_workers": 0,
+            "split_outputs": False,
+            "split_name": "{stem} - Lesson {first}-{last}",
+            "segment_cache_dir": "",
+            "segment_cache_max_mb": 2000,
+            "per_row_language_detection": False,
+            "language_sample_size": 50,
+            "offline_tts_latency_ms": 150,
+            "offline_tts_jitter_ms": 50,
+            "offline_tts_rate_limit": 0,
+            "offline_tts_error_rate": 0.0,
+            "offline_tts_seed": 0,
+            "trace_path": "",
+            "trace_format": "chrome",
+            "workspace_dir": "",
+            "workspace_quota_mb": 0,
+            "workspace_use_tmpfs": True,
+            "keep_artifacts": False,
+            "resume_jobs": False,
+            "jobs_dir": "",
             "lang1": "English",
             "lang2": "French"
         }
         
-        if os.path.exists(CONFIG_FILE):
+        if os.path.exists(path):
             try:
-                with open(CONFIG_FILE, "r") as f:
+                with open(path, "r") as f:
                     saved_config = json.load(f)
                     default_config.update(saved_config)
             except Exception as e:
@@ -0,0 +1,87 @@
+import csv
+import os
+
+SUPPORTED_EXTENSIONS = (".xlsx", ".xlsm", ".xls", ".csv", ".tsv", ".tab", ".parquet")
+
+
+def _cell_text(value):
+    """Cell value as slide text, or None for an empty cell."""
+    if value is None:
+        return None
+    if isinstance(value, float):
+        if value != value: # NaN
+            return None
+        if value.is_integer():
+            value = int(value)
+    text = str(value)
+    return text if text != "" else None
+
+
+def _rows_from_values(rows):
+    """Turns raw (col 1, col 2, ...) tuples into slide dicts, skipping incomplete rows."""
+    for row in rows:
+        if len(row) < 2:
+            continue
+        text1 = _cell_text(row[0])
+        text2 = _cell_text(row[1])
+        if text1 is None or text2 is None:
+            continue
+        yield {'text1': text1, 'text2': text2}
+
+
+def _iter_xlsx(file_path):
+    from openpyxl import load_workbook
+
+    # read_only streams rows from the XML instead of building the whole sheet
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        yield from _rows_from_values(sheet.iter_rows(max_col=2, values_only=True))
+    finally:
+        workbook.close()
+
+
+def _iter_xls(file_path):
+    # Legacy .xls is not supported by openpyxl; pandas (with xlrd) loads it whole
+    import pandas as pd
+
+    df = pd.read_excel(file_path, header=None, usecols=[0, 1])
+    yield from _rows_from_values(df.itertuples(index=False, name=None))
+
+
+def _iter_delimited(file_path, delimiter):
+    with open(file_path, newline="", encoding="utf-8-sig") as f:
+        yield from _rows_from_values(csv.reader(f, delimiter=delimiter))
+
+
+def _iter_parquet(file_path):
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Reading Parquet decks requires pyarrow (pip install pyarrow).")
+
+    parquet_file = pq.ParquetFile(file_path)
+    columns = parquet_file.schema_arrow.names[:2]
+    for batch in parquet_file.iter_batches(columns=columns):
+        col1, col2 = (batch.column(i).to_pylist() for i in range(2))
+        yield from _rows_from_values(zip(col1, col2))
+
+
+def iter_rows(file_path):
+    """
+    Lazily yields {'text1': ..., 'text2': ...} for each complete row of a deck.
+    Column 1 is language 1, column 2 is language 2; there is no header row.
+    Supports Excel (.xlsx/.xlsm/.xls), CSV, TSV and Parquet.
+    """
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext in (".xlsx", ".xlsm"):
+        return _iter_xlsx(file_path)
+    if ext == ".xls":
+        return _iter_xls(file_path)
+    if ext == ".csv":
+        return _iter_delimited(file_path, ",")
+    if ext in (".tsv", ".tab"):
+        return _iter_delimited(file_path, "\t")
+    if ext == ".parquet":
+        return _iter_parquet(file_path)
+    raise ValueError(f"Unsupported deck format '{ext}'. Use one of: {', '.join(SUPPORTED_EXTENSIONS)}")
@@ -0,0 +1,146 @@
+import os
+import sys
+import threading
+from PIL import ImageFont
+
+FONT_EXTENSIONS = (".ttf", ".otf", ".ttc")
+
+# Styles preferred when a family has several files (e.g. DejaVu Sans + DejaVu Sans Bold)
+REGULAR_STYLES = ("regular", "book", "normal", "roman", "medium")
+
+# Tried in order when the requested font cannot be found
+FALLBACK_FAMILIES = ("Arial", "Helvetica", "DejaVu Sans", "Liberation Sans", "Noto Sans")
+
+
+def system_font_dirs():
+    """Directories fonts are installed to on this platform."""
+    home = os.path.expanduser("~")
+    if sys.platform == "win32":
+        windir = os.environ.get("WINDIR", "C:\\Windows")
+        local = os.environ.get("LOCALAPPDATA", os.path.join(home, "AppData", "Local"))
+        return [os.path.join(windir, "Fonts"), os.path.join(local, "Microsoft", "Windows", "Fonts")]
+    if sys.platform == "darwin":
+        return ["/System/Library/Fonts", "/Library/Fonts", os.path.join(home, "Library", "Fonts")]
+    data_home = os.environ.get("XDG_DATA_HOME") or os.path.join(home, ".local", "share")
+    return ["/usr/share/fonts", "/usr/local/share/fonts",
+            os.path.join(data_home, "fonts"), os.path.join(home, ".fonts")]
+
+
+class FontRegistry:
+    """
+    Maps font family names (as listed by Tk's font.families()) to font files.
+    Font directories are scanned once, on the first lookup by family name.
+    Loaded fonts are cached by (path, size), so the slide loop never touches
+    the filesystem after the first slide.
+    """
+
+    def __init__(self, font_dirs=None):
+        self.font_dirs = font_dirs if font_dirs is not None else system_font_dirs()
+        self._families = None # family.lower() -> path
+        self._resolved = {} # requested name -> path, or None for the built-in font
+        self._fonts = {}
+        self._lock = threading.Lock()
+
+    def families(self):
+        """Returns {family name (lower case): font file path}."""
+        with self._lock:
+            if self._families is None:
+                self._families = self._scan()
+            return self._families
+
+    def find(self, name):
+        """Path of the font file for a family name or path, or None."""
+        if not name:
+            return None
+        if os.path.isfile(name):
+            return name
+        path = self.families().get(name.lower())
+        if path:
+            return path
+        # Last resort: let Pillow search for it as a file name (e.g. "arial" -> arial.ttf)
+        for candidate in (name, f"{name}.ttf"):
+            try:
+                return ImageFont.truetype(candidate, 10).path
+            except Exception:
+                pass
+        return None
+
+    def resolve(self, name):
+        """Like find(), but falls back to a common font and says so. Memoized."""
+        with self._lock:
+            if name in self._resolved:
+                return self._resolved[name]
+
+        path = self.find(name)
+        if path is None:
+            for family in FALLBACK_FAMILIES:
+                path = self.find(family)
+                if path:
+                    print(f"Font '{name}' not found, falling back to '{family}' ({path}).")
+                    break
+            else:
+                print(f"Font '{name}' not found and no fallback font installed, using Pillow's built-in font.")
+
+        with self._lock:
+            self._resolved[name] = path
+        return path
+
+    def get_font(self, name, size):
+        """Returns a loaded font for a family name or path, cached by (path, size)."""
+        path = self.resolve(name)
+        key = (path, size)
+        with self._lock:
+            font = self._fonts.get(key)
+        if font is not None:
+            return font
+
+        if path is None:
+            try:
+                font = ImageFont.load_default(size)
+            except TypeError:
+                # Pillow < 10.1 only has the fixed-size bitmap font
+                font = ImageFont.load_default()
+        else:
+            font = ImageFont.truetype(path, size)
+
+        with self._lock:
+            self._fonts.setdefault(key, font)
+            return self._fonts[key]
+
+    def _scan(self):
+        candidates = {}
+        for font_dir in self.font_dirs:
+            for root, dirs, files in os.walk(font_dir):
+                for filename in files:
+                    if not filename.lower().endswith(FONT_EXTENSIONS):
+                        continue
+                    path = os.path.join(root, filename)
+                    try:
+                        family, style = ImageFont.truetype(path, 10).getname()
+                    except Exception:
+                        continue
+                    if not family:
+                        continue
+                    rank = 0 if (style or "").lower() in REGULAR_STYLES else 1
+                    key = family.lower()
+                    # Keep the most "regular" file per family; ties go to the first found
+                    if key not in candidates or rank < candidates[key][0]:
+                        candidates[key] = (rank, path)
+        return {family: path for family, (rank, path) in candidates.items()}
+
+
+_default_registry = None
+_default_lock = threading.Lock()
+
+
+def default_registry():
+    """Process-wide registry, shared by every generator and render worker."""
+    global _default_registry
+    with _default_lock:
+        if _default_registry is None:
+            _default_registry = FontRegistry()
+        return _default_registry
+
+
+def get_font(name, size):
+    return default_registry().get_font(name, size)
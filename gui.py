@@ -3,15 +3,69 @@ import customtkinter as ctk
 from tkinter import filedialog, font
 import threading
 import os
+from collections import deque
 import pygame
 import utils
+import slides
 from config_manager import ConfigManager
 from logic import SlideshowConfig, SlideshowGenerator
+from voice_catalog import VoiceCatalog
 from PIL import Image, ImageTk
 
 ctk.set_appearance_mode("Dark")
 ctk.set_default_color_theme("blue")
 
+PREVIEW_DEBOUNCE_MS = 80 # wait for the slider to rest this long before rendering
+PREVIEW_POLL_MS = 20
+
+
+class PreviewRenderer:
+    """
+    Renders preview slides on one background thread.
+    Only the newest request is kept: requests made while a render is running
+    replace each other, so a dragged slider never queues up stale work.
+    Fonts and background plates come from the module caches in slides/fonts,
+    which the thread keeps warm between renders.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._request = None # (seq, config, text1, text2)
+        self._result = None # (seq, image or exception)
+        self._closed = False
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def submit(self, seq, config, text1, text2):
+        with self._cond:
+            self._request = (seq, config, text1, text2)
+            self._cond.notify()
+
+    def take_result(self):
+        """The latest finished (seq, image or exception), or None."""
+        with self._cond:
+            result, self._result = self._result, None
+            return result
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._request is None and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                (seq, config, text1, text2), self._request = self._request, None
+            try:
+                result = slides.render_slide(config, text1, text2)
+            except Exception as e:
+                result = e
+            with self._cond:
+                self._result = (seq, result)
+
 class SettingsDialog(ctk.CTkToplevel):
     def __init__(self, parent, config, callback_save):
         super().__init__(parent)
@@ -20,6 +74,12 @@ class SettingsDialog(ctk.CTkToplevel):
         self.title("Advanced Settings")
         self.geometry("900x700")
         
+        # Visual preview: debounced, rendered off the Tk thread
+        self.preview_renderer = PreviewRenderer()
+        self._preview_after = None
+        self._preview_poll = None
+        self._preview_seq = 0
+
         # Initialize pygame mixer for audio preview
         if not pygame.mixer.get_init():
             pygame.mixer.init()
@@ -107,8 +167,15 @@ class SettingsDialog(ctk.CTkToplevel):
             pass
 
     def update_visual_preview(self, event=None):
+        # Called on every slider move; only render once the slider rests
+        if self._preview_after:
+            self.after_cancel(self._preview_after)
+        self._preview_after = self.after(PREVIEW_DEBOUNCE_MS, self.request_visual_preview)
+
+    def request_visual_preview(self):
         # Generate a small preview using logic generator logic (roughly)
         # We simulate it with PIL and convert to ImageTk
+        self._preview_after = None
         
         # Mock config for generation
         temp_conf = SlideshowConfig()
@@ -120,14 +187,33 @@ class SettingsDialog(ctk.CTkToplevel):
         temp_conf.bg_opacity = self.var_opacity.get()
         temp_conf.output_resolution = (400, 225)
         
-        gen = SlideshowGenerator(temp_conf)
-        
-        try:
-            pil_img = gen.generate_slide("Preview Top Text", "Preview Bottom Text")
-            self.preview_image_tk = ImageTk.PhotoImage(pil_img)
-            self.canvas_preview.create_image(0, 0, anchor="nw", image=self.preview_image_tk)
-        except Exception as e:
-            print(f"Preview error: {e}")
+        self._preview_seq += 1
+        self.preview_renderer.submit(self._preview_seq, temp_conf, "Preview Top Text", "Preview Bottom Text")
+        if not self._preview_poll:
+            self._preview_poll = self.after(PREVIEW_POLL_MS, self.show_visual_preview)
+
+    def show_visual_preview(self):
+        # Tk objects may only be touched here, on the main thread
+        self._preview_poll = None
+        result = self.preview_renderer.take_result()
+        if result:
+            seq, pil_img = result
+            if isinstance(pil_img, Exception):
+                print(f"Preview error: {pil_img}")
+            elif seq == self._preview_seq: # an older render finishing late is dropped
+                self.preview_image_tk = ImageTk.PhotoImage(pil_img)
+                self.canvas_preview.delete("all")
+                self.canvas_preview.create_image(0, 0, anchor="nw", image=self.preview_image_tk)
+            if seq == self._preview_seq:
+                return
+        self._preview_poll = self.after(PREVIEW_POLL_MS, self.show_visual_preview)
+
+    def destroy(self):
+        for job in (self._preview_after, self._preview_poll):
+            if job:
+                self.after_cancel(job)
+        self.preview_renderer.close()
+        super().destroy()
 
     def setup_audio_tab(self):
         tab = self.tabview.tab("Audio & TTS")
@@ -193,8 +279,10 @@ class App(ctk.CTk):
         
         # Load Config
         self.config_data = ConfigManager.load_config()
-        # Initialize Voices Cache
-        self.all_google_voices = [] 
+        # Voices Cache: saved on disk, refreshed in the background
+        self.voice_catalog = VoiceCatalog()
+        self.voice_catalog.load()
+        self._voice_results = deque() # filled by the refresh thread, read on the Tk thread
         
         # Init audio for preview
         if not pygame.mixer.get_init():
@@ -270,8 +358,10 @@ class App(ctk.CTk):
         self.log_box = ctk.CTkTextbox(self)
         self.log_box.grid(row=4, column=0, padx=20, pady=10, sticky="nsew")
         
-        # Initial voice load if API key present
-        if self.config_data.get("api_key"):
+        # Show saved voices at once; fetch fresh ones in the background if they are old
+        if len(self.voice_catalog):
+            self.update_voice_lists()
+        if self.config_data.get("api_key") and self.voice_catalog.is_stale():
             self.refresh_voices(silent=True)
 
     def log(self, msg):
@@ -279,7 +369,8 @@ class App(ctk.CTk):
         self.log_box.see("end")
 
     def select_excel(self):
-        path = filedialog.askopenfilename(filetypes=[("Excel Files", "*.xlsx *.xls")])
+        path = filedialog.askopenfilename(filetypes=[("Decks", "*.xlsx *.xlsm *.xls *.csv *.tsv *.tab *.parquet"),
+                                                     ("Excel Files", "*.xlsx *.xls")])
         if path:
             self.excel_path.set(path)
             self.log(f"Selected: {path}")
@@ -301,13 +392,26 @@ class App(ctk.CTk):
 
         conf = SlideshowConfig()
         conf.api_key = api_key
-        gen = SlideshowGenerator(conf)
+
+        def fetch():
+            gen = SlideshowGenerator(conf)
+            try:
+                return gen.get_google_voices()
+            finally:
+                gen.close()
         
+        if not self.voice_catalog.refresh_async(fetch, lambda voices: self._voice_results.append((voices, silent))):
+            return # already fetching
         if not silent: self.log("Fetching defined voices from Google Cloud...")
-        voices = gen.get_google_voices()
-        
+        self.after(100, self.poll_voices)
+
+    def poll_voices(self):
+        # Runs on the Tk thread until the background fetch reports back
+        if not self._voice_results:
+            self.after(100, self.poll_voices)
+            return
+        voices, silent = self._voice_results.popleft()
         if voices:
-            self.all_google_voices = voices
             if not silent: self.log(f"Fetched {len(voices)} voices.")
             self.update_voice_lists()
         else:
@@ -353,11 +457,7 @@ class App(ctk.CTk):
     def play_preview(self, slot):
         # 1 or 2
         try:
-            conf = SlideshowConfig()
-            # Copy basic config
-            for k, v in self.config_data.items():
-                if hasattr(conf, k):
-                    setattr(conf, k, v)
+            conf = SlideshowConfig.from_dict(self.config_data)
             
             gen = SlideshowGenerator(conf)
             
@@ -382,7 +482,10 @@ class App(ctk.CTk):
             # Using generate_audio directly to bypass logic wrapping
             # wait, generate_audio needs text, lang_name, specific_voice_id
             
-            path = gen.generate_audio(text, lang, specific_voice_id=voice)
+            try:
+                path = gen.generate_audio(text, lang, specific_voice_id=voice)
+            finally:
+                gen.close()
             
             pygame.mixer.music.load(path)
             pygame.mixer.music.play()
@@ -392,16 +495,8 @@ class App(ctk.CTk):
 
     def filter_voices(self, lang_code):
         # Google voices have list of lang codes e.g. ['en-US']
-        # our lang_code is 'en', 'fr', etc.
-        filtered = []
-        for v in self.all_google_voices:
-            # Check if any code starts with our lang code
-            # e.g. 'en-US' starts with 'en'
-            for c in v['language_codes']:
-                if c.startswith(lang_code):
-                    filtered.append(v)
-                    break
-        return filtered
+        # our lang_code is 'en', 'fr', etc.; the catalog is indexed by prefix
+        return self.voice_catalog.voices_for(lang_code)
 
     def on_lang1_change(self, value):
         self.update_voice_lists()
@@ -427,21 +522,22 @@ class App(ctk.CTk):
             self.config_data["tts_voice_id_2"] = self.voice2.get()
             ConfigManager.save_config(self.config_data)
 
-            conf = SlideshowConfig()
-            for k, v in self.config_data.items():
-                if hasattr(conf, k):
-                    setattr(conf, k, v)
+            conf = SlideshowConfig.from_dict(self.config_data)
             
             gen = SlideshowGenerator(conf)
-            self.log("Loading data...")
-            data = gen.load_excel(excel)
-            
-            cost = gen.estimate_cost(data)
-            self.log(f"Estimated Cost: {cost}")
-            
-            output = os.path.splitext(excel)[0] + "_slideshow.mp4"
-            gen.create_video(data, self.lang1.get(), self.lang2.get(), output, 
-                             progress_callback=lambda p, m: self.log(f"{int(p*100)}%: {m}"))
+            try:
+                self.log("Loading data...")
+                data = gen.load_excel(excel)
+                
+                plan = gen.plan_synthesis(data, self.lang1.get(), self.lang2.get())
+                self.log(plan.summary())
+                
+                output = os.path.splitext(excel)[0] + "_slideshow.mp4"
+                gen.create_video(data, self.lang1.get(), self.lang2.get(), output, 
+                                 progress_callback=lambda p, m: self.log(f"{int(p*100)}%: {m}"))
+                self.log("Timings:\n" + gen.last_trace.summary_table())
+            finally:
+                gen.close()
             
             self.log("Done!")
         except Exception as e:
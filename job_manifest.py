@@ -0,0 +1,115 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+from audio_cache import default_cache_dir
+
+MANIFEST_NAME = "manifest.jsonl"
+
+
+def default_jobs_dir():
+    return os.path.join(os.path.dirname(default_cache_dir()), "jobs")
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def job_id(data, lang1, lang2, settings):
+    """
+    Identifies a run: the deck's rows, its languages and every setting that
+    changes the output. Re-running the same deck and settings gives the same id.
+    """
+    digest = hashlib.sha256()
+    digest.update(json.dumps([lang1, lang2, settings], sort_keys=True, default=str).encode("utf-8"))
+    for item in data:
+        digest.update(json.dumps([item['text1'], item['text2']], ensure_ascii=False).encode("utf-8"))
+    return digest.hexdigest()[:24]
+
+
+class JobManifest:
+    """
+    Append-only record of a run's finished work: synthesized clips, rendered
+    slides and encoded segments, each with the SHA-256 of its file.
+    One JSON line per finished item keeps checkpoints cheap for long decks; a
+    line torn by a crash is ignored on load. A later run of the same job
+    reuses items whose files still match their checksum and redoes the rest.
+    """
+
+    def __init__(self, job_dir):
+        self.job_dir = job_dir
+        self.slide_dir = os.path.join(job_dir, "slides")
+        os.makedirs(self.slide_dir, exist_ok=True)
+        self._path = os.path.join(job_dir, MANIFEST_NAME)
+        self._records = {}
+        self._lock = threading.Lock()
+        self._load()
+        self.resumed = bool(self._records)
+        self._file = open(self._path, "a", encoding="utf-8")
+
+    @classmethod
+    def open(cls, job, jobs_dir=None):
+        return cls(os.path.join(jobs_dir or default_jobs_dir(), job))
+
+    def _load(self):
+        try:
+            with open(self._path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                        self._records[(record["kind"], record["name"])] = record
+                    except (ValueError, KeyError):
+                        continue # torn write from a crash
+        except FileNotFoundError:
+            pass
+
+    def count(self, kind):
+        with self._lock:
+            return sum(1 for k, name in self._records if k == kind)
+
+    def record(self, kind, name, path):
+        """Marks an item done; its file's checksum is stored with it."""
+        record = {"kind": kind, "name": name, "path": path, "sha256": file_sha256(path)}
+        with self._lock:
+            self._records[(kind, name)] = record
+            self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self._file.flush()
+
+    def verified(self, kind, name):
+        """
+        The recorded path of a finished item if its file still matches the
+        checksum. A missing or changed file is deleted and forgotten, so the
+        item is redone. Returns None if the item was never finished.
+        """
+        with self._lock:
+            record = self._records.get((kind, name))
+        if record is None:
+            return None
+        path = record["path"]
+        try:
+            if file_sha256(path) == record["sha256"]:
+                return path
+        except OSError:
+            pass
+        print(f"Checkpoint for {kind} {name} failed verification; redoing it.")
+        with self._lock:
+            self._records.pop((kind, name), None)
+        if os.path.exists(path):
+            os.remove(path)
+        return None
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+    def finish(self, keep=False):
+        """The run succeeded: closes the manifest and, unless keep, deletes the job directory."""
+        self.close()
+        if not keep:
+            shutil.rmtree(self.job_dir, ignore_errors=True)
@@ -0,0 +1,50 @@
+import hashlib
+import threading
+from collections import Counter
+from langdetect import DetectorFactory, detect
+
+# langdetect is randomized; a fixed seed makes detection repeatable between runs
+DetectorFactory.seed = 0
+
+DEFAULT_LANGUAGE = 'en'
+
+
+class LanguageDetector:
+    """Seeded langdetect wrapper that remembers results by text digest."""
+
+    def __init__(self):
+        self._memo = {}
+        self._lock = threading.Lock()
+
+    def detect(self, text):
+        """Language code for text, or DEFAULT_LANGUAGE if it cannot be detected."""
+        digest = hashlib.sha1(text.encode("utf-8")).hexdigest()
+        with self._lock:
+            code = self._memo.get(digest)
+        if code is not None:
+            return code
+        try:
+            code = detect(text)
+        except Exception as e:
+            print(f"Language detection failed for '{text}': {e}. Defaulting to '{DEFAULT_LANGUAGE}'.")
+            code = DEFAULT_LANGUAGE
+        with self._lock:
+            self._memo[digest] = code
+        return code
+
+    def detect_column(self, texts, sample_size=50):
+        """
+        One language for a whole column, by majority vote over up to
+        sample_size rows spread evenly through it.
+        """
+        texts = [t for t in texts if t and t.strip()]
+        if not texts:
+            return DEFAULT_LANGUAGE
+        step = max(1, len(texts) // sample_size)
+        sample = texts[::step][:sample_size]
+        votes = Counter(self.detect(t) for t in sample)
+        code, count = votes.most_common(1)[0]
+        if count < 0.6 * len(sample):
+            print(f"Column looks mixed ({dict(votes)}); using '{code}'. "
+                  f"Enable per-row language detection for mixed columns.")
+        return code
@@ -1,13 +1,45 @@
+import json
 import os
-import tempfile
-import pandas as pd
-from PIL import Image, ImageDraw, ImageFont
-from gtts import gTTS
-from google.cloud import texttospeech
-from google.api_core import client_options
-from moviepy import ImageClip, AudioFileClip, concatenate_videoclips, CompositeAudioClip
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from moviepy import ImageClip, AudioFileClip, concatenate_videoclips
 import utils
-from langdetect import detect
+from audio_cache import AudioCache, make_key
+import audio_timeline
+import deck_loader
+import job_manifest
+import slides
+import synthesis
+import tempo
+import timing
+import video_encoder
+from tts_providers import GoogleCloudProvider, GTTSProvider, OfflineProvider, ResilientProvider
+from language import LanguageDetector
+from workspace import Workspace
+
+def job_name(job):
+    """Name of a synthesis job in a job manifest."""
+    return json.dumps(list(job), ensure_ascii=False)
+
+
+# Generous audio length per row, for sizing the workspace
+WORKSPACE_SECONDS_PER_ROW = 20
+
+
+# Settings that change a run's output, and so identify a resumable job
+JOB_SETTINGS = slides.SLIDE_STYLE_FIELDS + (
+    "tts_provider",
+    "tts_voice_id_1",
+    "tts_voice_id_2",
+    "tts_speed",
+    "sentence_pause",
+    "slide_pause",
+    "video_engine",
+    "constant_frame_rate",
+)
 
 class SlideshowConfig:
     def __init__(self):
@@ -18,262 +50,263 @@ class SlideshowConfig:
         self.bg_opacity = 0.5 # 0.0 to 1.0 (overlay opacity)
         self.slide_pause = 0.5 # seconds
         self.sentence_pause = 0.5 # seconds
-        self.tts_provider = "gTTS" # or "google_cloud"
+        self.tts_provider = "gTTS" # or "google_cloud", or "offline" (local stand-in for load tests)
         self.api_key = ""
         self.tts_voice_id_1 = "" 
         self.tts_voice_id_2 = ""
         self.tts_speed = 1.0 # 0.5 to 4.0
         self.output_resolution = (1920, 1080)
         self.text_color = "white"
+        self.audio_cache_dir = "" # Empty = per-user cache dir, shared across runs
+        self.audio_cache_max_mb = 500 # Least recently used audio is evicted past this
+        self.tts_concurrency = 4 # TTS requests in flight during the synthesis pre-pass
+        self.tts_client_pool_size = 1 # Google Cloud clients (gRPC channels) shared by those requests
+        self.tts_rate_limit = 0 # Google Cloud/offline requests per second; 0 = unlimited (Google's default quota is 1000/min)
+        self.tts_max_retries = 4 # Retries for throttled (429) and transient errors, with exponential backoff
+        self.tts_fallback_to_gtts = True # Replace clips that still fail with gTTS (mixes voices)
+        self.render_workers = 0 # Slide render processes; 0 = one per CPU core, 1 = render in-process
+        self.video_engine = "ffmpeg" # "ffmpeg" (still-image encode) or "moviepy"
+        self.stream_assembly = True # moviepy engine: load one slide at a time instead of keeping every clip open
+        self.constant_frame_rate = False # ffmpeg engine: repeat frames at 24 fps instead of one frame per slide
+        self.incremental_segments = False # ffmpeg engine: cache each slide's encoded segment, re-encode only changed slides
+        self.encode_chunk_rows = 0 # ffmpeg engine: encode chunks of this many slides in parallel; 0 = no row limit
+        self.encode_chunk_seconds = 0 # ffmpeg engine: end a chunk once it is this long; 0 = no time limit
+        self.encode_workers = 0 # Parallel ffmpeg encodes; 0 = one per CPU core
+        self.split_outputs = False # ffmpeg engine: write each chunk as its own video instead of one file
+        self.split_name = "{stem} - Lesson {first}-{last}" # Split file names; first/last are row numbers
+        self.segment_cache_dir = "" # Empty = per-user cache dir next to the audio cache
+        self.segment_cache_max_mb = 2000
+        self.per_row_language_detection = False # 'Auto' columns: detect every row instead of once per column
+        self.language_sample_size = 50 # 'Auto' columns: rows sampled for the per-column vote
+        # "offline" provider: simulated network behaviour (see tts_providers.OfflineProvider)
+        self.offline_tts_latency_ms = 150
+        self.offline_tts_jitter_ms = 50
+        self.offline_tts_rate_limit = 0 # requests/second, 0 = unlimited
+        self.offline_tts_error_rate = 0.0 # 0.0 to 1.0
+        self.offline_tts_seed = 0
+        self.trace_path = "" # Write per-stage timings here after each run; a directory gets one file per video
+        self.trace_format = "chrome" # "chrome" (chrome://tracing, Perfetto) or "json"
+        self.workspace_dir = "" # Intermediates (slides, raw audio); empty = tmpfs if the run fits, else the temp dir
+        self.workspace_quota_mb = 0 # Fail a run whose intermediates grow past this; 0 = unlimited
+        self.workspace_use_tmpfs = True # Only for runs whose quota or estimated size fits (see workspace.pick_base_dir)
+        self.keep_artifacts = False # Leave intermediates on disk after runs, for debugging
+        self.resume_jobs = False # Checkpoint clips, slides and segments so a crashed run of the same deck resumes
+        self.jobs_dir = "" # Checkpoints of unfinished runs; empty = per-user cache dir
+
+    @classmethod
+    def from_dict(cls, values):
+        """Config with every known key of values applied (e.g. the saved settings). Unknown keys are ignored."""
+        conf = cls()
+        for k, v in values.items():
+            if hasattr(conf, k):
+                setattr(conf, k, v)
+        return conf
 
 class SlideshowGenerator:
     def __init__(self, config: SlideshowConfig):
         self.config = config
-        self.temp_dir = tempfile.mkdtemp()
+        self.workspace = Workspace(config.workspace_dir or None, config.workspace_quota_mb,
+                                   config.workspace_use_tmpfs, config.keep_artifacts)
+        self.audio_cache = AudioCache(config.audio_cache_dir or None, config.audio_cache_max_mb)
+        self._providers = {}
+        self._provider_lock = threading.Lock()
+        self.render_pool = slides.SlideRenderPool(config.render_workers)
+        self.language_detector = LanguageDetector()
+        self.last_trace = None # timing.Tracer of the latest create_video
 
-    def load_excel(self, file_path):
-        """Loads Excel. Assumes col 1 is lang1, col 2 is lang2."""
-        df = pd.read_excel(file_path, header=None)
-        # Drop rows with missing values
-        df = df.dropna(subset=[0, 1])
-        data = []
-        for index, row in df.iterrows():
-            data.append({
-                'text1': str(row[0]),
-                'text2': str(row[1])
-            })
-        return data
+    @property
+    def temp_dir(self):
+        """Scratch directory for this generator, created on first use (previews never need one)."""
+        return self.workspace.path
 
-    def generate_slide(self, text1, text2):
-        """Creates a PIL Image for the slide."""
-        width, height = self.config.output_resolution
-        
-        # Background
-        if self.config.bg_image_path and os.path.exists(self.config.bg_image_path):
-            try:
-                bg = Image.open(self.config.bg_image_path).convert('RGBA')
-                # Resize to cover
-                bg_ratio = bg.width / bg.height
-                screen_ratio = width / height
-                if bg_ratio > screen_ratio:
-                    # wider than screen, crop sides
-                    new_height = height
-                    new_width = int(new_height * bg_ratio)
-                else:
-                    new_width = width
-                    new_height = int(new_width / bg_ratio)
-                
-                bg = bg.resize((new_width, new_height), Image.LANCZOS)
-                # Center crop
-                left = (new_width - width) / 2
-                top = (new_height - height) / 2
-                bg = bg.crop((left, top, left + width, top + height))
-            except Exception as e:
-                print(f"Error loading background: {e}")
-                bg = Image.new('RGBA', (width, height), 'black')
+    def provider(self, name):
+        """TTS provider by name, created on first use and shared by all threads."""
+        with self._provider_lock:
+            provider = self._providers.get(name)
+            if provider is None:
+                provider = self._providers[name] = self._create_provider(name)
+            return provider
+
+    def _create_provider(self, name):
+        config = self.config
+        if name == 'gTTS':
+            return GTTSProvider()
+        if name == 'google_cloud':
+            provider = GoogleCloudProvider(config.api_key, config.tts_client_pool_size)
+        elif name == 'offline':
+            provider = OfflineProvider(config.offline_tts_latency_ms, config.offline_tts_jitter_ms,
+                                       config.offline_tts_rate_limit, config.offline_tts_error_rate,
+                                       seed=config.offline_tts_seed)
         else:
-            bg = Image.new('RGBA', (width, height), 'black')
-
-        # Opacity Overlay (Darken background)
-        # If opacity is 100% (1.0), we see fully black overlay? 
-        # Requirement: "set the opacity from 0-100%" for the background image.
-        # usually means how visible the background is. 100% = fully visible. 0% = black.
-        # Let's interpret config.bg_opacity as "Background Visibility".
-        # So we overlay black with alpha = (1 - visibility).
-        
-        overlay = Image.new('RGBA', (width, height), (0, 0, 0, int(255 * (1 - self.config.bg_opacity))))
-        bg = Image.alpha_composite(bg, overlay)
-        
-        # Text Drawing
-        draw = ImageDraw.Draw(bg)
-        
-        try:
-            # Try to load font, fallback to default
-            # If font_name is provided, try to find it. 
-            # Pillow needs a path to a ttf file usually, or system font loading is platform specific.
-            # For simplicity, if it's a path use it, otherwise try default.
-            # In a real app we might map font family names to paths.
-            # Just relying on font_path from config which should be updating with absolute path from GUI if possible?
-            # Or if it's just a name "Arial", PIL might find it if installed.
-            font = ImageFont.truetype(self.config.font_name, self.config.font_size)
-        except:
-            # Try appending .ttf
-            try:
-                font = ImageFont.truetype(f"{self.config.font_name}.ttf", self.config.font_size)
-            except:
-                font = ImageFont.load_default()
-            # Default font size is fixed/small, so this is a bad fallback but prevents crash.
+            raise ValueError(f"Unknown TTS provider '{name}'")
+        # Paid/quota'd services: pace, retry and back off instead of failing over to gTTS
+        return ResilientProvider(provider, config.tts_rate_limit, config.tts_concurrency,
+                                 config.tts_max_retries)
 
-        margin = 100
-        max_text_width = width - (2 * margin)
-        
-        lines1 = utils.wrap_text(text1, font, max_text_width)
-        lines2 = utils.wrap_text(text2, font, max_text_width)
-        
-        # Calculate total height to center everything
-        # We want text1 on top half, text2 on bottom half? 
-        # Requirement: "sentence of language 1 on top, and language 2 on the bottom. Everything should be centered"
-        # Let's put a gap between them.
-        
-        line_height = self.config.font_size * 1.2
-        total_text_height = (len(lines1) + len(lines2)) * line_height + line_height # +1 line gap
-        
-        start_y = (height - total_text_height) / 2
-        
-        # Draw Text 1
-        current_y = start_y
-        for line in lines1:
-            # Center horizontally
-            bbox = font.getbbox(line)
-            w = bbox[2] - bbox[0]
-            x = (width - w) / 2
-            draw.text((x, current_y), line, font=font, fill=self.config.text_color)
-            current_y += line_height
-            
-        # Gap
-        current_y += line_height
-        
-        # Draw Text 2
-        for line in lines2:
-            bbox = font.getbbox(line)
-            w = bbox[2] - bbox[0]
-            x = (width - w) / 2
-            draw.text((x, current_y), line, font=font, fill=self.config.text_color)
-            current_y += line_height
-            
-        return bg.convert('RGB')
+    @property
+    def google_provider(self):
+        """Google Cloud clients, created on first use and shared by all threads."""
+        return self.provider('google_cloud')
+
+    def active_provider_name(self):
+        """The provider generate_audio uses: Google Cloud needs an API key, otherwise gTTS."""
+        name = self.config.tts_provider
+        if name == 'google_cloud' and not self.config.api_key:
+            return 'gTTS'
+        return name
+
+    def close(self):
+        """Releases network connections, worker processes and the workspace held by the generator."""
+        with self._provider_lock:
+            providers, self._providers = self._providers, {}
+        for provider in providers.values():
+            provider.close()
+        self.render_pool.close()
+        self.workspace.cleanup()
 
+    def load_excel(self, file_path):
+        """Loads a deck (Excel, CSV, TSV or Parquet). Assumes col 1 is lang1, col 2 is lang2."""
+        return list(deck_loader.iter_rows(file_path))
+
+    def stream_deck(self, file_path):
+        """Like load_excel, but yields rows as they are parsed. create_video accepts the generator."""
+        return deck_loader.iter_rows(file_path)
 
+    def generate_slide(self, text1, text2):
+        """Creates a PIL Image for the slide."""
+        return slides.render_slide(self.config, text1, text2)
 
-    def generate_audio(self, text, lang_name, specific_voice_id=None):
-        """Generates audio file for text. Returns path."""
+    def generate_audio(self, text, lang_name, specific_voice_id=None, allow_fallback=True, defer_tempo=False):
+        """
+        Generates audio file for text. Returns path.
+        With defer_tempo, a gTTS clip that still needs its speed changed is
+        returned as a tempo.PendingTempo for finish_tempo() to process in bulk.
+        """
         lang_code = utils.get_language_code(lang_name)
         
         if lang_code == 'auto':
+            # create_video resolves 'Auto' per column beforehand; this covers previews
+            lang_code = self.language_detector.detect(text)
+            print(f"Detected language for '{text}': {lang_code}")
+
+        name = self.active_provider_name()
+        if name != 'gTTS':
+            provider = self.provider(name)
+            key = self._audio_key(text, lang_code, name, specific_voice_id)
+            filepath = self.audio_cache.get(key, provider.ext)
+            if filepath:
+                return filepath
             try:
-                lang_code = detect(text)
-                print(f"Detected language for '{text}': {lang_code}")
+                return self.audio_cache.store(
+                    key, lambda path: provider.synthesize(
+                        text, lang_code, specific_voice_id, self.config.tts_speed, path),
+                    provider.ext)
             except Exception as e:
-                print(f"Language detection failed: {e}. Defaulting to 'en'.")
-                lang_code = 'en'
+                if not (allow_fallback and provider.gtts_fallback and self.config.tts_fallback_to_gtts):
+                    raise
+                print(f"{name} TTS failed: {e}. Falling back to gTTS.")
+                provider.note_fallback()
+                # Fallback
 
-        filename = f"tts_{hash(text)}_{lang_code}_{self.config.tts_provider}_{self.config.tts_speed}_{specific_voice_id}.mp3"
-        filepath = os.path.join(self.temp_dir, filename)
-        
-        if os.path.exists(filepath):
+        # gTTS has no voice selection, so the voice is not part of its key.
+        # A Google failure is cached under this key too, never under the Google one.
+        key = self._audio_key(text, lang_code, 'gTTS')
+        filepath = self.audio_cache.get(key)
+        if filepath:
             return filepath
 
-        if self.config.tts_provider == 'google_cloud' and self.config.api_key:
-            try:
-                options = client_options.ClientOptions(api_key=self.config.api_key)
-                client = texttospeech.TextToSpeechClient(client_options=options)
-                input_text = texttospeech.SynthesisInput(text=text)
-                # Voice selection
-                voice_params = {"language_code": lang_code}
-                
-                # Use specific voice if provided, otherwise config, otherwise neutral
-                vid = specific_voice_id
-                
-                if vid:
-                    voice_params["name"] = vid
-                    # Fix for Google Cloud strict matching: 'es' != 'es-ES'
-                    # If we have a specific voice, we should trust its language code.
-                    # Voice IDs are usually "lang-region-voice" (e.g. es-ES-Standard-A)
-                    parts = vid.split('-')
-                    if len(parts) >= 2:
-                         voice_params["language_code"] = f"{parts[0]}-{parts[1]}"
-                
-                print(f"DEBUG: voice_params={voice_params}")
-                
-                # Check for gender in voice name if manual selection not present, or just default to Neutral
-                # If tts_voice_id is present, it usually implies gender/type.
-                
-                voice = texttospeech.VoiceSelectionParams(**voice_params)
-
-                audio_config = texttospeech.AudioConfig(
-                    audio_encoding=texttospeech.AudioEncoding.MP3,
-                    speaking_rate=self.config.tts_speed
-                )
-                response = client.synthesize_speech(
-                    input=input_text, voice=voice, audio_config=audio_config
-                )
-                with open(filepath, "wb") as out:
-                    out.write(response.audio_content)
-                return filepath
-            except Exception as e:
-                print(f"Google Cloud TTS failed: {e}. Falling back to gTTS.")
-                # Fallback
-        
+        if defer_tempo and self.config.tts_speed != 1.0:
+            # Download at normal speed now; the tempo change happens in one batch later
+            raw_path = os.path.join(self.temp_dir, f"raw_{key}_{uuid.uuid4().hex}.mp3")
+            self._synthesize_gtts(text, lang_code, raw_path, adjust_tempo=False)
+            return tempo.PendingTempo(key, raw_path)
+
+        return self.audio_cache.store(key, lambda path: self._synthesize_gtts(text, lang_code, path))
+
+    def _audio_key(self, text, lang_code, provider_name, voice_id=None):
+        # gTTS has no voice selection, so the voice is not part of its key
+        if provider_name == 'gTTS':
+            voice_id = None
+        return make_key(text, lang_code, provider_name, voice_id, self.config.tts_speed)
+
+    def is_cached(self, text, lang_name, voice_id=None):
+        """Whether generate_audio would find text in the audio cache. Not counted as a hit or miss."""
+        lang_code = utils.get_language_code(lang_name)
+        if lang_code == 'auto':
+            return False
+        name = self.active_provider_name()
+        ext = self.provider(name).ext if name != 'gTTS' else ".mp3"
+        return self.audio_cache.contains(self._audio_key(text, lang_code, name, voice_id), ext)
+
+    def _synthesize_gtts(self, text, lang_code, filepath, adjust_tempo=True):
         # gTTS
         # gTTS doesn't support fine-grained speed control natively easily without hacks or post-processing.
-        # But we can assume standard speed for now.
-        tts = gTTS(text=text, lang=lang_code, slow=False)
-        tts.save(filepath)
+        # User requested speed control for gTTS too, so we post-process with ffmpeg's atempo filter.
+        gtts = self.provider('gTTS')
         
-        # If speed is not 1.0, we might want to use ffmpeg/moviepy to speed it up/slow down later?
-        # For this iteration, let's keep gTTS speed fixed or implement a hack if critical.
-        # User requested speed control for gTTS too.
-        # We can do this by post-processing the audio file with moviepy/ffmpeg right now.
-        
-        if self.config.tts_speed != 1.0:
-            # Rename original to 'raw'
-            raw_path = filepath + "_raw.mp3"
-            os.rename(filepath, raw_path)
-            # Use moviepy to change speed? AudioFileClip doesn't have speed change easily.
-            # Using ffmpeg via moviepy's ffmpeg_tools or just os.system
-            # setpts filter is for video, atempo is for audio.
-            # cmd: ffmpeg -i input -filter:a "atempo=SPEED" -vn output
-            import subprocess
-            cmd = [
-                "ffmpeg", "-y", "-i", raw_path, 
-                "-filter:a", f"atempo={self.config.tts_speed}", 
-                "-vn", filepath
-            ]
-            subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-            
-        return filepath
+        if self.config.tts_speed == 1.0 or not adjust_tempo:
+            gtts.synthesize(text, lang_code, None, 1.0, filepath)
+            return
+
+        # Save the original as 'raw' next to the output; only the stretched file gets cached
+        raw_path = filepath + "_raw.mp3"
+        gtts.synthesize(text, lang_code, None, 1.0, raw_path)
+        try:
+            tempo.stretch_many([(raw_path, filepath)], self.config.tts_speed)
+        finally:
+            os.remove(raw_path)
+
+    def finish_tempo(self, pending):
+        """
+        Changes the speed of deferred gTTS clips (see generate_audio) with one
+        ffmpeg process per batch instead of one per clip, and caches only the
+        stretched results. Returns {key: cached path}.
+        """
+        # Two jobs can share a key (same text and language, different Google voice)
+        unique = {p.key: p for p in pending}
+        stretched = [(p.raw_path, p.raw_path[:-len(".mp3")] + "_stretched.mp3") for p in unique.values()]
+        try:
+            tempo.stretch_many(stretched, self.config.tts_speed)
+            paths = {}
+            for key, (raw_path, out_path) in zip(unique, stretched):
+                paths[key] = self.audio_cache.store(key, lambda path: shutil.move(out_path, path))
+            return paths
+        finally:
+            for p in pending:
+                if os.path.exists(p.raw_path):
+                    os.remove(p.raw_path)
+            for raw_path, out_path in stretched:
+                if os.path.exists(out_path):
+                    os.remove(out_path)
 
     def get_google_voices(self):
         """Returns a list of available voices from Google Cloud."""
         if not self.config.api_key:
             return []
         try:
-            options = client_options.ClientOptions(api_key=self.config.api_key)
-            client = texttospeech.TextToSpeechClient(client_options=options)
-            response = client.list_voices()
-            voices = []
-            for voice in response.voices:
-                # Filter by our supported languages slightly? Or just return all?
-                # Returning all is safer, GUI can filter.
-                voices.append({
-                    "name": voice.name,
-                    "language_codes": voice.language_codes,
-                    "ssml_gender": texttospeech.SsmlVoiceGender(voice.ssml_gender).name
-                })
-            return voices
+            # Returning all is safer, GUI can filter.
+            return self.google_provider.list_voices()
         except Exception as e:
             print(f"Error fetching voices: {e}")
             return []
 
-    def estimate_cost(self, data):
-        """Estimates cost for Google Cloud TTS."""
-        if self.config.tts_provider != 'google_cloud':
-            return "Free (gTTS)"
-        
-        char_count = 0
-        for item in data:
-            char_count += len(item.get('text1', ''))
-            char_count += len(item.get('text2', ''))
-        
-        # Standard: $4.00 / 1M chars
-        # WaveNet: $16.00 / 1M chars
-        # Assuming WaveNet if using google cloud usually? Or check config.
-        # Let's assume standard price avg or show both.
-        
-        cost_standard = (char_count / 1_000_000) * 4.00
-        cost_wavenet = (char_count / 1_000_000) * 16.00
-        
-        return f"~${cost_standard:.4f} (Std) / ~${cost_wavenet:.4f} (WaveNet)"
+    def plan_synthesis(self, data, lang1, lang2):
+        """
+        The unique clips data needs, which are cached, and what the rest will
+        cost and take (a synthesis.SynthesisPlan). Nothing is synthesized.
+        """
+        langs1 = self.resolve_languages([item['text1'] for item in data], lang1)
+        langs2 = self.resolve_languages([item['text2'] for item in data], lang2)
+        return synthesis.plan_jobs(self, data, langs1, langs2,
+                                   self.config.tts_voice_id_1, self.config.tts_voice_id_2,
+                                   self.config.tts_concurrency)
+
+    def estimate_cost(self, data, lang1="English", lang2="French"):
+        """Estimates cost for Google Cloud TTS: only uncached, unique clips are billed, by voice tier."""
+        plan = self.plan_synthesis(data, lang1, lang2)
+        if plan.provider != 'google_cloud':
+            return f"Free ({plan.provider})"
+        return plan.cost_text()
 
     def preview_audio(self, text, lang_name):
         """Generates a preview audio file and returns the path."""
@@ -282,75 +315,330 @@ class SlideshowGenerator:
         path = self.generate_audio(text, lang_name)
         return path
 
+    def resolve_languages(self, texts, lang_name):
+        """
+        Per-row language for a column: lang_name itself unless it is 'Auto',
+        in which case the detected language code (one per column by default).
+        """
+        if utils.get_language_code(lang_name) != 'auto':
+            return [lang_name] * len(texts)
+
+        start = time.perf_counter()
+        if self.config.per_row_language_detection:
+            langs = [self.language_detector.detect(text) for text in texts]
+        else:
+            code = self.language_detector.detect_column(texts, self.config.language_sample_size)
+            print(f"Detected column language: {code}")
+            langs = [code] * len(texts)
+        print(f"Language detection: {time.perf_counter() - start:.2f}s")
+        return langs
+
+    def _load_and_render(self, rows, slide_path, progress_callback=None, tracer=None):
+        """
+        Collects rows from an iterable, handing each slide to the render pool
+        as soon as its row is parsed. Returns the rows as a list.
+        """
+        data = []
+
+        def tasks():
+            for item in rows:
+                data.append(item)
+                yield (item['text1'], item['text2'], slide_path(len(data) - 1))
+
+        def render_progress(done, total):
+            if progress_callback:
+                progress_callback(0.0, f"Loading and rendering slide {done}")
+
+        self.render_pool.render(self.config, tasks(), render_progress, tracer)
+        return data
+
     def create_video(self, data, lang1, lang2, output_path, progress_callback=None):
         """
         Main orchestration function.
-        data: list of dicts {'text1': ..., 'text2': ...}
+        data: list of dicts {'text1': ..., 'text2': ...}, or an iterable of
+        them (see stream_deck); slides are then rendered while rows arrive.
+        Stage and per-slide timings are kept in self.last_trace (a
+        timing.Tracer) and written to config.trace_path if set.
         """
-        clips = []
+        tracer = self.last_trace = timing.Tracer()
+        manifest = None
+        if self.config.resume_jobs:
+            data = list(data)
+            manifest = self._open_manifest(data, lang1, lang2)
+        # A streamed deck's size is unknown, so it stays off tmpfs unless it has a quota
+        self.workspace.expect(self.estimate_workspace_bytes(len(data)) if isinstance(data, list) else None)
+        try:
+            with tracer.span("create_video", "run"):
+                self._create_video(data, lang1, lang2, output_path, progress_callback, tracer, manifest)
+            if manifest:
+                manifest.finish(keep=self.config.keep_artifacts)
+        finally:
+            # Intermediates go whether the run finished, failed or was interrupted;
+            # checkpointed work stays in the job directory until the run succeeds
+            if manifest:
+                manifest.close()
+            self.workspace.clear()
+            # Only now may the cache evict: this run's clips are no longer needed
+            self.audio_cache.trim()
+
+        if self.config.trace_path:
+            path = self.config.trace_path
+            if os.path.isdir(path):
+                # One trace per video, e.g. for batch runs
+                path = os.path.join(path, os.path.splitext(os.path.basename(output_path))[0] + ".trace.json")
+            tracer.export(path, self.config.trace_format)
+            print(f"Trace written to {path}")
         
+        if progress_callback:
+            progress_callback(1.0, "Done!")
+
+    def _encode_segments(self, indexes, slide_paths, durations, fingerprints, segment_paths, segment_cache,
+                         workers, manifest, tracer, progress_callback):
+        """Encodes the given slides' segments into the segment cache, workers at a time."""
+        threads = video_encoder.encoder_threads(min(workers, len(indexes)))
+
+        def encode(i):
+            with tracer.span("encode_segment", "slide", slide=i):
+                return segment_cache.store(
+                    fingerprints[i],
+                    lambda path: video_encoder.encode_segment(slide_paths[i], durations[i], path,
+                                                              constant_frame_rate=self.config.constant_frame_rate,
+                                                              threads=threads),
+                    ".mp4")
+
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            futures = {pool.submit(encode, i): i for i in indexes}
+            for done, future in enumerate(as_completed(futures), 1):
+                i = futures[future]
+                segment_paths[i] = future.result()
+                if manifest:
+                    manifest.record("segment", str(i), segment_paths[i])
+                progress_callback(done, len(indexes))
+
+    def _join_segments(self, groups, ranges, durations, audio_track, output_path):
+        """
+        Stitches encoded segments (one list per range) without re-encoding:
+        into output_path, or with split_outputs into one numbered video per
+        range, each with its slice of the audio track.
+        """
+        if not self.config.split_outputs:
+            segments = [path for group in groups for path in group]
+            video_encoder.concat_segments(segments, audio_track, output_path, self.temp_dir)
+            return
+        stem, ext = os.path.splitext(output_path)
+        folder, stem = os.path.split(stem)
+        starts = [0.0]
+        for duration in durations:
+            starts.append(starts[-1] + duration)
+        for group, (start, end) in zip(groups, ranges):
+            name = self.config.split_name.format(stem=stem, first=start + 1, last=end)
+            path = os.path.join(folder, name + (ext or ".mp4"))
+            video_encoder.concat_segments(group, audio_track, path, self.temp_dir,
+                                          starts[start], starts[end] - starts[start])
+            print(f"Wrote {path}")
+
+    def estimate_workspace_bytes(self, rows):
+        """
+        Upper-bound guess at a run's intermediates: an uncompressed-size PNG
+        per slide plus the 16-bit audio track at WORKSPACE_SECONDS_PER_ROW.
+        """
+        width, height = self.config.output_resolution
+        slide = width * height * 3
+        audio = WORKSPACE_SECONDS_PER_ROW * audio_timeline.SAMPLE_RATE * 2
+        return rows * (slide + audio)
+
+    def _open_manifest(self, data, lang1, lang2):
+        settings = {name: getattr(self.config, name) for name in JOB_SETTINGS}
+        # The path alone misses an image edited in place, which would reuse stale slides
+        settings["bg_mtime"] = slides.background_mtime(self.config)
+        job = job_manifest.job_id(data, lang1, lang2, settings)
+        manifest = job_manifest.JobManifest.open(job, self.config.jobs_dir or None)
+        if manifest.resumed:
+            print(f"Resuming job {job}: {manifest.count('audio')} clips, {manifest.count('slide')} slides, "
+                  f"{manifest.count('segment')} segments checkpointed")
+        return manifest
+
+    def _create_video(self, data, lang1, lang2, output_path, progress_callback, tracer, manifest=None):
+        # ffmpeg engine: one audio track plus (png, seconds) per slide
+        use_ffmpeg = self.config.video_engine == 'ffmpeg'
+        # Resumable runs encode slide by slide, so finished segments survive a crash
+        incremental = use_ffmpeg and (self.config.incremental_segments or manifest is not None)
+        
+        # Resumable runs keep slides in the job directory instead of the workspace
+        slide_dir = manifest.slide_dir if manifest else self.temp_dir
+
+        def slide_path(i):
+            return os.path.join(slide_dir, f"slide_{i}.png")
+
+        rendered_early = False
+        if not isinstance(data, list):
+            with tracer.span("load_deck"):
+                if incremental:
+                    data = list(data)
+                else:
+                    data = self._load_and_render(data, slide_path, progress_callback, tracer)
+            # Incremental mode only renders changed slides, which needs durations first
+            rendered_early = not incremental
+
         total_steps = len(data)
         
-        for i, item in enumerate(data):
+        # Resolve 'Auto' languages before synthesis, so a column keeps one voice
+        with tracer.span("detect_languages"):
+            langs1 = self.resolve_languages([item['text1'] for item in data], lang1)
+            langs2 = self.resolve_languages([item['text2'] for item in data], lang2)
+        
+        # Synthesize every unique clip up front, several requests at a time.
+        # The steps below only look paths up, so the result is the same
+        # as generating them one by one.
+        voice1 = self.config.tts_voice_id_1
+        voice2 = self.config.tts_voice_id_2
+        checkpoint = None
+        if manifest:
+            # Checkpointed clips are checked against their checksum; a damaged
+            # clip is deleted from the cache here, so it is synthesized again
+            for job in synthesis.collect_jobs(data, langs1, langs2, voice1, voice2):
+                manifest.verified("audio", job_name(job))
+            checkpoint = lambda job, path: manifest.record("audio", job_name(job), path)
+        plan = synthesis.plan_jobs(self, data, langs1, langs2, voice1, voice2, self.config.tts_concurrency)
+        print(plan.summary())
+        jobs = plan.jobs
+
+        def synthesis_progress(done, total):
             if progress_callback:
-                progress_callback(i / total_steps, f"Processing slide {i+1}/{total_steps}")
-
-            text1 = item['text1']
-            text2 = item['text2']
-            
-            # Generate Image
-            img = self.generate_slide(text1, text2)
-            img_path = os.path.join(self.temp_dir, f"slide_{i}.png")
-            img.save(img_path)
-            
-            # Generate Audio
-            # We need to map lang1/lang2 to voice1/voice2
-            audio1_path = self.generate_audio(text1, lang1, specific_voice_id=self.config.tts_voice_id_1)
-            audio2_path = self.generate_audio(text2, lang2, specific_voice_id=self.config.tts_voice_id_2)
-            
-            # Create Clips
-            # Audio 1
-            audio1_clip = AudioFileClip(audio1_path)
-            # Audio 2
-            audio2_clip = AudioFileClip(audio2_path)
-            
-            # Total duration calculation
-            # Pattern: Read 1 -> Pause -> Read 2 -> Pause
-            
-            # We construct the audio track first
-            # Silence clip
-            pause_sentence = AudioFileClip(os.path.join(self.temp_dir, "silence.mp3")) if False else None 
-            # Moviepy making silence is slightly annoying without a file, 
-            # let's just use set_start for positioning.
-            
-            # Sequence:
-            # 0s: Start Audio 1
-            # audio1_end: Wait sentence_pause
-            # audio1_end + sentence_pause: Start Audio 2
-            # audio2_end: Wait slide_pause
-            
-            total_dur = audio1_clip.duration + self.config.sentence_pause + audio2_clip.duration + self.config.slide_pause
-            
-            # Create Composite Audio
-            # audio1 starts at 0
-            audio1_clip = audio1_clip.with_start(0)
-            
-            # audio2 starts at len(a1) + pause
-            t_audio2 = audio1_clip.duration + self.config.sentence_pause
-            audio2_clip = audio2_clip.with_start(t_audio2)
-            
-            combined_audio = CompositeAudioClip([audio1_clip, audio2_clip])
-            combined_audio.duration = total_dur # Enforce duration including final pause
-            
-            # Video Clip (Static Image)
-            video_clip = ImageClip(img_path).with_duration(total_dur)
-            video_clip.audio = combined_audio
-            
-            clips.append(video_clip)
-            
-        final_video = concatenate_videoclips(clips)
-        final_video.write_videofile(output_path, fps=24, codec='libx264', audio_codec='aac')
+                progress_callback(0.4 * done / total, f"Synthesizing audio {done}/{total}")
+
+        with tracer.span("synthesis", clips=len(jobs)):
+            audio_paths = synthesis.run_jobs(self, jobs, self.config.tts_concurrency, synthesis_progress, tracer,
+                                             checkpoint)
+        self.workspace.check_quota("synthesis")
         
+        # Build the whole audio track in one pass: each unique clip is decoded
+        # once and placed at its exact sample offset.
+        # Pattern per slide: Read 1 -> Pause -> Read 2 -> Pause
         if progress_callback:
-            progress_callback(1.0, "Done!")
+            progress_callback(0.4, "Building audio track...")
+        pairs = [(audio_paths[synthesis.SynthesisJob(item['text1'], l1, voice1)],
+                  audio_paths[synthesis.SynthesisJob(item['text2'], l2, voice2)])
+                 for item, l1, l2 in zip(data, langs1, langs2)]
+        audio_track = os.path.join(self.temp_dir, "audio.wav")
+        # ffmpeg engine: whole-frame durations, so each slide starts on its own keyframe
+        with tracer.span("audio_track"):
+            durations = audio_timeline.build_track(pairs, audio_track, self.config.sentence_pause,
+                                                   self.config.slide_pause,
+                                                   fps=video_encoder.FPS if use_ffmpeg else None)
+        self.workspace.check_quota("building the audio track")
+        
+        slide_paths = [slide_path(i) for i in range(total_steps)]
+        to_render = [] if rendered_early else list(range(total_steps))
+        
+        if incremental:
+            # Only slides whose text, style or duration changed get re-rendered and re-encoded
+            segment_cache = video_encoder.SegmentCache(self.config.segment_cache_dir or None,
+                                                       self.config.segment_cache_max_mb)
+            style = slides.slide_style(self.config)
+            bg_mtime = slides.background_mtime(self.config)
+            fingerprints = [
+                video_encoder.segment_fingerprint(style, item['text1'], item['text2'], dur,
+                                                  constant_frame_rate=self.config.constant_frame_rate,
+                                                  bg_mtime=bg_mtime)
+                for item, dur in zip(data, durations)
+            ]
+            segment_paths = [segment_cache.get(fp, ".mp4") for fp in fingerprints]
+            if manifest:
+                for i, path in enumerate(segment_paths):
+                    # verified() deletes a damaged checkpointed segment; encode it again
+                    if path and manifest.verified("segment", str(i)) is None and not os.path.exists(path):
+                        segment_paths[i] = None
+            to_render = [i for i, path in enumerate(segment_paths) if path is None]
+            print(f"Segments: {total_steps - len(to_render)} reused, {len(to_render)} to encode")
+        
+        to_draw = to_render
+        on_slide = None
+        if manifest:
+            # Slides rendered before the crash are reused if their checksum matches
+            to_draw = [i for i in to_render if manifest.verified("slide", str(i)) is None]
+            slide_index = {slide_paths[i]: i for i in to_draw}
+            on_slide = lambda path: manifest.record("slide", str(slide_index[path]), path)
+        
+        # Render slide images, spread over the render worker processes
+        def render_progress(done, total):
+            if done % 100 == 0:
+                self.workspace.check_quota(f"rendering {done} slides")
+            if progress_callback:
+                progress_callback(0.45 + 0.35 * done / total, f"Rendering slide {done}/{total}")
+
+        if to_draw:
+            render_tasks = [(data[i]['text1'], data[i]['text2'], slide_paths[i]) for i in to_draw]
+            with tracer.span("render_slides", slides=len(render_tasks)):
+                self.render_pool.render(self.config, render_tasks, render_progress, tracer, on_slide)
+        self.workspace.check_quota("rendering slides")
+        
+        if use_ffmpeg:
+            # Let ffmpeg show each PNG for its duration instead of compositing
+            # every frame in Python.
+            if progress_callback:
+                progress_callback(0.8, "Encoding video...")
+            ranges = video_encoder.chunk_ranges(durations, self.config.encode_chunk_rows,
+                                                self.config.encode_chunk_seconds)
+            workers = self.config.encode_workers or os.cpu_count() or 1
 
+            def encode_progress(done, total):
+                if progress_callback:
+                    progress_callback(0.8 + 0.15 * done / total, f"Encoding {done}/{total}")
+
+            with tracer.span("encode", engine="ffmpeg", chunks=len(ranges)):
+                if incremental:
+                    self._encode_segments(to_render, slide_paths, durations, fingerprints, segment_paths,
+                                          segment_cache, workers, manifest, tracer, encode_progress)
+                    groups = [segment_paths[start:end] for start, end in ranges]
+                elif len(ranges) > 1 or self.config.split_outputs:
+                    still_slides = list(zip(slide_paths, durations))
+                    groups = [[path] for path in video_encoder.encode_chunks(
+                        still_slides, ranges, self.temp_dir, workers,
+                        constant_frame_rate=self.config.constant_frame_rate, tracer=tracer,
+                        progress_callback=encode_progress)]
+                else:
+                    groups = None
+                    still_slides = list(zip(slide_paths, durations))
+                    video_encoder.encode_slideshow(still_slides, audio_track, output_path, self.temp_dir,
+                                                   constant_frame_rate=self.config.constant_frame_rate)
+                if groups is not None:
+                    with tracer.span("stitch"):
+                        self._join_segments(groups, ranges, durations, audio_track, output_path)
+            if incremental:
+                # Only once they are stitched may this run's segments be evicted
+                segment_cache.trim()
+        else:
+            with tracer.span("encode", engine="moviepy", streaming=self.config.stream_assembly):
+                if self.config.stream_assembly:
+                    # One slide decoded at a time, whatever the deck's length
+                    video = video_encoder.streaming_slides_clip(list(zip(slide_paths, durations)))
+                else:
+                    clips = []
+                    for img_path, total_dur in zip(slide_paths, durations):
+                        # Video Clip (Static Image)
+                        clips.append(ImageClip(img_path).with_duration(total_dur))
+                    video = concatenate_videoclips(clips)
+                audio = AudioFileClip(audio_track)
+                final_video = video.with_audio(audio)
+                try:
+                    final_video.write_videofile(output_path, fps=24, codec='libx264', audio_codec='aac',
+                                                temp_audiofile_path=self.temp_dir)
+                finally:
+                    # Release the audio reader (an ffmpeg process and its pipes) now, not at GC
+                    audio.close()
+                    final_video.close()
+        
+        stats = self.audio_cache.stats()
+        print(f"Audio cache: {stats['hits']} hits, {stats['misses']} misses")
+        for provider in list(self._providers.values()):
+            latency = provider.latency.summary()
+            if latency["count"]:
+                print(f"{provider.name} TTS: {latency['count']} requests, mean {latency['mean_ms']:.0f} ms, "
+                      f"p95 {latency['p95_ms']:.0f} ms")
+            if isinstance(provider, ResilientProvider):
+                counters = provider.counters()
+                if counters["throttled"] or counters["retried"] or counters["fell_back"]:
+                    print(f"{provider.name} TTS: {counters['throttled']} throttled, {counters['retried']} retried, "
+                          f"{counters['failed']} failed, {counters['fell_back']} fell back to gTTS "
+                          f"(concurrency now {counters['concurrency_limit']})")
@@ -0,0 +1,228 @@
+import functools
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image, ImageDraw
+import fonts
+import utils
+
+# Config attributes that affect how a slide looks. Render workers get only these.
+SLIDE_STYLE_FIELDS = (
+    "font_name",
+    "font_size",
+    "bg_image_path",
+    "bg_opacity",
+    "output_resolution",
+    "text_color",
+)
+
+
+def slide_style(config):
+    """Compact, picklable copy of the rendering settings in config."""
+    return tuple((name, getattr(config, name)) for name in SLIDE_STYLE_FIELDS)
+
+
+class _Style:
+    """Stands in for SlideshowConfig inside render workers."""
+
+    def __init__(self, style):
+        self.__dict__.update(style)
+
+
+@functools.lru_cache(maxsize=4)
+def _scaled_background(bg_image_path, mtime, size):
+    # mtime is only part of the cache key, so an edited image is reloaded
+    width, height = size
+    
+    # Background
+    if bg_image_path and os.path.exists(bg_image_path):
+        try:
+            bg = Image.open(bg_image_path).convert('RGBA')
+            # Resize to cover
+            bg_ratio = bg.width / bg.height
+            screen_ratio = width / height
+            if bg_ratio > screen_ratio:
+                # wider than screen, crop sides
+                new_height = height
+                new_width = int(new_height * bg_ratio)
+            else:
+                new_width = width
+                new_height = int(new_width / bg_ratio)
+            
+            bg = bg.resize((new_width, new_height), Image.LANCZOS)
+            # Center crop
+            left = (new_width - width) / 2
+            top = (new_height - height) / 2
+            bg = bg.crop((left, top, left + width, top + height))
+        except Exception as e:
+            print(f"Error loading background: {e}")
+            bg = Image.new('RGBA', (width, height), 'black')
+    else:
+        bg = Image.new('RGBA', (width, height), 'black')
+    return bg
+
+
+@functools.lru_cache(maxsize=8)
+def _background_plate(bg_image_path, mtime, size, bg_opacity):
+    # Scaling is cached separately, so changing only the opacity
+    # (e.g. dragging the preview slider) just redoes the overlay
+    width, height = size
+    bg = _scaled_background(bg_image_path, mtime, size)
+
+    # Opacity Overlay (Darken background)
+    # If opacity is 100% (1.0), we see fully black overlay? 
+    # Requirement: "set the opacity from 0-100%" for the background image.
+    # usually means how visible the background is. 100% = fully visible. 0% = black.
+    # Let's interpret bg_opacity as "Background Visibility".
+    # So we overlay black with alpha = (1 - visibility).
+    
+    overlay = Image.new('RGBA', (width, height), (0, 0, 0, int(255 * (1 - bg_opacity))))
+    bg = Image.alpha_composite(bg, overlay)
+    return bg.convert('RGB')
+
+
+def background_mtime(config):
+    """Modification time of config's background image, or None if there is none."""
+    try:
+        return os.path.getmtime(config.bg_image_path) if config.bg_image_path else None
+    except OSError:
+        return None
+
+
+def background_plate(config):
+    """
+    The resized, cropped and darkened background for config, as an RGB image.
+    It is identical for every slide, so it is built once per
+    (image, mtime, resolution, opacity) and cached. Callers must copy() it
+    before drawing.
+    """
+    return _background_plate(config.bg_image_path or "", background_mtime(config),
+                             tuple(config.output_resolution), config.bg_opacity)
+
+
+def render_slide(config, text1, text2):
+    """Creates a PIL Image for the slide."""
+    width, height = config.output_resolution
+    
+    # Background, shared by every slide with the same settings
+    bg = background_plate(config).copy()
+    
+    # Text Drawing
+    draw = ImageDraw.Draw(bg)
+    
+    # font_name is a family name from the GUI (or a path); the registry maps it
+    # to a file once and keeps the loaded font, falling back loudly if missing.
+    font = fonts.get_font(config.font_name, config.font_size)
+
+    margin = 100
+    max_text_width = width - (2 * margin)
+    
+    # (line, width) pairs; the widths are reused for centering below
+    lines1 = utils.wrap_text_with_widths(text1, font, max_text_width)
+    lines2 = utils.wrap_text_with_widths(text2, font, max_text_width)
+    
+    # Calculate total height to center everything
+    # We want text1 on top half, text2 on bottom half? 
+    # Requirement: "sentence of language 1 on top, and language 2 on the bottom. Everything should be centered"
+    # Let's put a gap between them.
+    
+    line_height = config.font_size * 1.2
+    total_text_height = (len(lines1) + len(lines2)) * line_height + line_height # +1 line gap
+    
+    start_y = (height - total_text_height) / 2
+    
+    # Draw Text 1
+    current_y = start_y
+    for line, w in lines1:
+        # Center horizontally
+        x = (width - w) / 2
+        draw.text((x, current_y), line, font=font, fill=config.text_color)
+        current_y += line_height
+        
+    # Gap
+    current_y += line_height
+    
+    # Draw Text 2
+    for line, w in lines2:
+        x = (width - w) / 2
+        draw.text((x, current_y), line, font=font, fill=config.text_color)
+        current_y += line_height
+        
+    return bg
+
+
+def _render_task(task):
+    """
+    Worker entry point: renders one slide straight to its PNG path.
+    Returns (out_path, timings) with timings = (pid, thread id, start,
+    drawn, saved) as time.perf_counter values, for the tracer.
+    """
+    style, text1, text2, out_path = task
+    start = time.perf_counter()
+    image = render_slide(_Style(style), text1, text2)
+    drawn = time.perf_counter()
+    image.save(out_path)
+    return out_path, (os.getpid(), threading.get_ident(), start, drawn, time.perf_counter())
+
+
+def worker_context():
+    # The parent may hold open gRPC channels, which must not be forked.
+    # forkserver forks workers from a clean helper process; spawn elsewhere.
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("forkserver")
+    return multiprocessing.get_context("spawn")
+
+
+class SlideRenderPool:
+    """
+    Renders slides on a pool of worker processes.
+    The pool is created on first use and kept until close(), so a generator
+    that renders several decks only pays the worker start-up cost once.
+    """
+
+    def __init__(self, workers=0):
+        self.workers = workers or os.cpu_count() or 1
+        self._pool = None
+
+    def render(self, config, tasks, progress_callback=None, tracer=None, on_done=None):
+        """
+        tasks: list of (text1, text2, out_path), or any iterable of them.
+        An iterable is consumed lazily, so workers start on the first slides
+        while later ones are still being produced; progress_callback then
+        gets None as the total.
+        Writes every slide and returns the paths in task order.
+        tracer: a timing.Tracer to record each slide's draw and PNG write in.
+        on_done: called with each slide's path as soon as it is written.
+        """
+        style = slide_style(config)
+        jobs = ((style, text1, text2, out_path) for text1, text2, out_path in tasks)
+        total = len(tasks) if hasattr(tasks, "__len__") else None
+
+        if self.workers == 1 or (total is not None and total < 2):
+            results = map(_render_task, jobs)
+        else:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=worker_context())
+            # Unknown length: small chunks so the first slides are not held back
+            chunksize = max(1, total // (self.workers * 4)) if total is not None else 4
+            results = self._pool.map(_render_task, jobs, chunksize=chunksize)
+
+        paths = []
+        for done, (path, (pid, tid, start, drawn, saved)) in enumerate(results, 1):
+            paths.append(path)
+            if on_done:
+                on_done(path)
+            if tracer:
+                slide = os.path.basename(path)
+                tracer.add("draw_slide", start, drawn - start, "slide", pid, tid, slide=slide)
+                tracer.add("write_png", drawn, saved - drawn, "slide", pid, tid, slide=slide)
+            if progress_callback:
+                progress_callback(done, total)
+        return paths
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
@@ -0,0 +1,190 @@
+import contextlib
+import math
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from tempo import PendingTempo
+
+
+class SynthesisJob(namedtuple("SynthesisJob", ["text", "lang_name", "voice_id", "fallback"])):
+    """
+    One unique clip to synthesize.
+    fallback: whether a failed Google Cloud request may be replaced by gTTS.
+    """
+    __slots__ = ()
+
+    def __new__(cls, text, lang_name, voice_id=None, fallback=True):
+        return super().__new__(cls, text, lang_name, voice_id or None, fallback)
+
+
+def collect_jobs(data, lang1, lang2, voice1=None, voice2=None, fallback=True):
+    """
+    Returns the unique jobs needed for a deck, in order of first use.
+    lang1/lang2: a language for the whole column, or a list with one per row.
+    """
+    if isinstance(lang1, str):
+        lang1 = [lang1] * len(data)
+    if isinstance(lang2, str):
+        lang2 = [lang2] * len(data)
+    jobs = {}
+    for item, l1, l2 in zip(data, lang1, lang2):
+        for job in (SynthesisJob(item['text1'], l1, voice1, fallback),
+                    SynthesisJob(item['text2'], l2, voice2, fallback)):
+            jobs.setdefault(job, None)
+    return list(jobs)
+
+
+# Google Cloud TTS prices in USD per million characters, by voice tier.
+# The tier is read from the voice name, e.g. "en-US-Wavenet-A" -> WaveNet.
+PRICE_PER_MILLION = {
+    "Standard": 4.00,
+    "WaveNet": 16.00,
+    "Neural2": 16.00,
+    "Polyglot": 16.00,
+    "News": 16.00,
+    "Casual": 16.00,
+    "Journey": 30.00,
+    "Chirp-HD": 30.00,
+    "Chirp3-HD": 30.00,
+    "Studio": 160.00,
+}
+# Unrecognised tiers are priced like WaveNet, the common premium price
+OTHER_TIER = "Other"
+OTHER_PRICE_PER_MILLION = 16.00
+
+# Per-request latency (seconds) assumed before a provider has been measured
+DEFAULT_LATENCY = {"google_cloud": 0.4, "gTTS": 0.7}
+
+
+def voice_tier(voice_id):
+    """Pricing tier of a Google voice name; no voice means Google's default (Standard)."""
+    if not voice_id:
+        return "Standard"
+    # Drop language and region: "en-US-Chirp3-HD-Achernar" -> "chirp3-hd-achernar"
+    rest = "-".join(voice_id.split("-")[2:]).lower()
+    for tier in sorted(PRICE_PER_MILLION, key=len, reverse=True):
+        if rest == tier.lower() or rest.startswith(tier.lower() + "-"):
+            return tier
+    return OTHER_TIER
+
+
+class SynthesisPlan:
+    """
+    What a deck needs from TTS, worked out before anything is synthesized.
+    jobs: unique clips in order of first use; cached: those already in the
+    audio cache; requests: those that will reach the provider.
+    billable: {tier: characters} for paid providers, otherwise empty.
+    """
+
+    def __init__(self, provider, occurrences, jobs, cached, billable, expected_seconds, concurrency):
+        self.provider = provider
+        self.occurrences = occurrences
+        self.jobs = jobs
+        self.cached = cached
+        self.requests = [job for job in jobs if job not in cached]
+        self.billable = billable
+        self.expected_seconds = expected_seconds
+        self.concurrency = concurrency
+
+    @property
+    def billable_chars(self):
+        return sum(self.billable.values())
+
+    @property
+    def cost(self):
+        return sum(chars / 1_000_000 * PRICE_PER_MILLION.get(tier, OTHER_PRICE_PER_MILLION)
+                   for tier, chars in self.billable.items())
+
+    def cost_text(self):
+        if not self.billable:
+            return "Free" if self.provider != "google_cloud" else "$0 (everything cached)"
+        tiers = ", ".join(f"{tier} {chars:,}" for tier, chars in sorted(self.billable.items()))
+        return f"~${self.cost:.4f} for {self.billable_chars:,} chars ({tiers})"
+
+    def summary(self):
+        return (f"Synthesis plan ({self.provider}): {self.occurrences} clips in deck, "
+                f"{len(self.jobs)} unique, {len(self.cached)} cached -> {len(self.requests)} requests\n"
+                f"Cost: {self.cost_text()}\n"
+                f"Expected TTS time: ~{self.expected_seconds:.0f} s at {self.concurrency} concurrent requests")
+
+
+def expected_latency(generator, provider_name):
+    """Mean request latency measured so far for a provider, else a typical value."""
+    if provider_name == "offline":
+        return generator.config.offline_tts_latency_ms / 1000
+    summary = generator.provider(provider_name).latency.summary()
+    if summary["count"]:
+        return summary["mean_ms"] / 1000
+    return DEFAULT_LATENCY.get(provider_name, 0.5)
+
+
+def plan_jobs(generator, data, lang1, lang2, voice1=None, voice2=None, concurrency=4):
+    """
+    Reduces a deck to its unique jobs, checks which are cached and prices
+    and times the rest for the generator's active provider.
+    lang1/lang2: as for collect_jobs.
+    """
+    jobs = collect_jobs(data, lang1, lang2, voice1, voice2)
+    cached = {job for job in jobs if generator.is_cached(job.text, job.lang_name, job.voice_id)}
+    provider = generator.active_provider_name()
+
+    billable = {}
+    if provider == "google_cloud":
+        for job in jobs:
+            if job not in cached:
+                tier = voice_tier(job.voice_id)
+                billable[tier] = billable.get(tier, 0) + len(job.text)
+
+    requests = len(jobs) - len(cached)
+    concurrency = max(1, concurrency)
+    expected = math.ceil(requests / concurrency) * expected_latency(generator, provider)
+    return SynthesisPlan(provider, 2 * len(data), jobs, cached, billable, expected, concurrency)
+
+
+def run_jobs(generator, jobs, max_workers=4, progress_callback=None, tracer=None, checkpoint=None):
+    """
+    Synthesizes every job with at most max_workers requests in flight.
+    Returns {job: audio_path}. Each job fails on its own; once all jobs have
+    finished, the first failure (in job order) is raised.
+    tracer: a timing.Tracer to record each clip (cache hits included) in.
+    checkpoint: called as checkpoint(job, path) as soon as each clip is final.
+    """
+    results = {}
+    errors = {}
+    total = len(jobs)
+
+    def run(job):
+        span = tracer.span("tts_clip", "tts", chars=len(job.text)) if tracer else contextlib.nullcontext()
+        with span:
+            return generator.generate_audio(job.text, job.lang_name,
+                                            specific_voice_id=job.voice_id,
+                                            allow_fallback=job.fallback,
+                                            defer_tempo=True)
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        futures = {pool.submit(run, job): job for job in jobs}
+        for done, future in enumerate(as_completed(futures), 1):
+            job = futures[future]
+            try:
+                results[job] = future.result()
+                if checkpoint and not isinstance(results[job], PendingTempo):
+                    checkpoint(job, results[job])
+            except Exception as e:
+                print(f"TTS failed for '{job.text}': {e}")
+                errors[job] = e
+            if progress_callback:
+                progress_callback(done, total)
+
+    if errors:
+        first = next(job for job in jobs if job in errors)
+        raise RuntimeError(f"{len(errors)} of {total} audio clips failed to synthesize") from errors[first]
+
+    # gTTS clips that still need their speed changed are stretched together
+    pending = {job: result for job, result in results.items() if isinstance(result, PendingTempo)}
+    if pending:
+        with tracer.span("tempo", clips=len(pending)) if tracer else contextlib.nullcontext():
+            stretched = generator.finish_tempo(list(pending.values()))
+        for job, result in pending.items():
+            results[job] = stretched[result.key]
+            if checkpoint:
+                checkpoint(job, results[job])
+    return results
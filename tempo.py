@@ -0,0 +1,41 @@
+from collections import namedtuple
+from video_encoder import run_ffmpeg
+
+# Clips per ffmpeg process; keeps the command line well under OS limits
+BATCH_SIZE = 64
+
+# A gTTS clip saved at normal speed, waiting for the batched tempo stage
+PendingTempo = namedtuple("PendingTempo", ["key", "raw_path"])
+
+
+def atempo_filter(speed):
+    """
+    atempo filter chain for speed. Older ffmpeg builds only accept factors in
+    [0.5, 2.0] per atempo instance, so larger changes are chained.
+    """
+    factors = []
+    while speed > 2.0:
+        factors.append(2.0)
+        speed /= 2.0
+    while speed < 0.5:
+        factors.append(0.5)
+        speed /= 0.5
+    factors.append(speed)
+    return ",".join(f"atempo={f:.6f}" for f in factors)
+
+
+def stretch_many(pairs, speed, batch_size=BATCH_SIZE):
+    """
+    Changes the tempo of many clips, keeping their pitch.
+    pairs: list of (input_path, output_path). Each batch of clips is handled
+    by a single ffmpeg process with one input and one output per clip.
+    """
+    audio_filter = atempo_filter(speed)
+    for start in range(0, len(pairs), batch_size):
+        batch = pairs[start:start + batch_size]
+        args = []
+        for input_path, output_path in batch:
+            args += ["-i", input_path]
+        for n, (input_path, output_path) in enumerate(batch):
+            args += ["-map", f"{n}:a", "-filter:a", audio_filter, "-vn", output_path]
+        run_ffmpeg(args)
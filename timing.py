@@ -0,0 +1,118 @@
+import contextlib
+import json
+import os
+import threading
+import time
+
+# Upper bounds (seconds) of the histogram buckets; the last bucket is open-ended
+HISTOGRAM_BOUNDS = (0.001, 0.01, 0.1, 1.0, 10.0)
+
+
+def _bucket_label(i):
+    if i == len(HISTOGRAM_BOUNDS):
+        return f">={HISTOGRAM_BOUNDS[-1]:g}s"
+    return f"<{HISTOGRAM_BOUNDS[i]:g}s"
+
+
+class Tracer:
+    """
+    Collects timed spans from any thread (and from worker processes, see add()).
+    Times come from time.perf_counter, which is system-wide on the platforms we
+    support, so spans measured in render workers line up with the parent's.
+    """
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self._spans = []
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def span(self, name, cat="stage", **args):
+        """Times the with-block as one span."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, start, time.perf_counter() - start, cat, **args)
+
+    def add(self, name, start, duration, cat="stage", pid=None, tid=None, **args):
+        """Records a span measured elsewhere. start is a time.perf_counter value."""
+        span = {
+            "name": name,
+            "cat": cat,
+            "start": start,
+            "duration": duration,
+            "pid": pid or os.getpid(),
+            "tid": tid or threading.get_ident(),
+            "args": args,
+        }
+        with self._lock:
+            self._spans.append(span)
+
+    def spans(self):
+        with self._lock:
+            return list(self._spans)
+
+    def summary(self):
+        """Aggregate per span name: count, total and percentiles (seconds) plus a histogram."""
+        groups = {}
+        for span in self.spans():
+            groups.setdefault(span["name"], []).append(span["duration"])
+        result = {}
+        for name, durations in groups.items():
+            durations.sort()
+            n = len(durations)
+            histogram = [0] * (len(HISTOGRAM_BOUNDS) + 1)
+            for d in durations:
+                histogram[sum(d >= bound for bound in HISTOGRAM_BOUNDS)] += 1
+            result[name] = {
+                "count": n,
+                "total": sum(durations),
+                "mean": sum(durations) / n,
+                "p50": durations[n // 2],
+                "p95": durations[min(n - 1, int(n * 0.95))],
+                "max": durations[-1],
+                "histogram": {_bucket_label(i): c for i, c in enumerate(histogram) if c},
+            }
+        return result
+
+    def summary_table(self):
+        """The summary as a fixed-width text table, slowest stage first."""
+        rows = sorted(self.summary().items(), key=lambda item: item[1]["total"], reverse=True)
+        lines = [f"{'Stage':<22} {'Count':>6} {'Total s':>8} {'Mean ms':>8} {'p95 ms':>8} {'Max ms':>8}"]
+        for name, s in rows:
+            lines.append(f"{name:<22} {s['count']:>6} {s['total']:>8.2f} {1000 * s['mean']:>8.1f} "
+                         f"{1000 * s['p95']:>8.1f} {1000 * s['max']:>8.1f}")
+        return "\n".join(lines)
+
+    def chrome_trace(self):
+        """Spans in Chrome's trace event format (chrome://tracing, Perfetto)."""
+        events = []
+        for span in self.spans():
+            events.append({
+                "name": span["name"],
+                "cat": span["cat"],
+                "ph": "X",
+                "ts": (span["start"] - self.origin) * 1e6,
+                "dur": span["duration"] * 1e6,
+                "pid": span["pid"],
+                "tid": span["tid"],
+                "args": span["args"],
+            })
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def export(self, path, fmt="chrome"):
+        """
+        Writes the trace to path. fmt "chrome" is the trace event format;
+        "json" is {"spans": [...], "summary": {...}} with times in seconds
+        relative to the start of the trace.
+        """
+        if fmt == "chrome":
+            data = self.chrome_trace()
+        elif fmt == "json":
+            spans = [{**span, "start": span["start"] - self.origin} for span in self.spans()]
+            data = {"spans": spans, "summary": self.summary()}
+        else:
+            raise ValueError(f"Unknown trace format '{fmt}'")
+        with open(path, "w") as f:
+            json.dump(data, f, indent=1)
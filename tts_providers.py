@@ -0,0 +1,388 @@
+import hashlib
+import itertools
+import random
+import threading
+import time
+import wave
+import numpy as np
+from gtts import gTTS
+from google.cloud import texttospeech
+from google.api_core import client_options
+from google.api_core import exceptions as google_exceptions
+
+
+class TTSError(Exception):
+    """A synthesis request failed on the provider's side."""
+
+
+class RateLimitError(TTSError):
+    """The provider refused a request because its rate limit was exceeded."""
+
+
+# Errors that mean "slow down": quota exceeded / HTTP 429
+THROTTLE_ERRORS = (RateLimitError, google_exceptions.ResourceExhausted, google_exceptions.TooManyRequests)
+# Errors worth retrying as they are: the request itself was fine
+TRANSIENT_ERRORS = (TTSError, google_exceptions.ServiceUnavailable, google_exceptions.DeadlineExceeded,
+                    google_exceptions.InternalServerError, google_exceptions.GatewayTimeout,
+                    google_exceptions.Aborted, ConnectionError, TimeoutError)
+
+
+class TokenBucket:
+    """rate tokens per second, holding at most burst (default: one second's worth). rate 0 = unlimited."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1.0, float(rate))
+        self._tokens = self.capacity
+        self._refilled = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _take(self):
+        # Returns 0 if a token was taken, else the seconds until one is available
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._refilled) * self.rate)
+        self._refilled = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0
+        return (1 - self._tokens) / self.rate
+
+    def try_acquire(self):
+        """Takes a token if one is available right now."""
+        if not self.rate:
+            return True
+        with self._lock:
+            return self._take() == 0
+
+    def acquire(self):
+        """Takes a token, waiting for one if necessary."""
+        if not self.rate:
+            return
+        while True:
+            with self._lock:
+                wait = self._take()
+            if not wait:
+                return
+            time.sleep(wait)
+
+
+class AdaptiveConcurrency:
+    """
+    Limits requests in flight with AIMD: the limit halves when the provider
+    throttles and grows by one after a full limit's worth of successes,
+    between minimum and maximum.
+    """
+
+    def __init__(self, maximum, minimum=1):
+        self.maximum = max(1, maximum)
+        self.minimum = max(1, min(minimum, self.maximum))
+        self.limit = float(self.maximum)
+        self._in_flight = 0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            while self._in_flight >= int(self.limit):
+                self._cond.wait()
+            self._in_flight += 1
+
+    def release(self, throttled=False):
+        with self._cond:
+            self._in_flight -= 1
+            if throttled:
+                self.limit = max(self.minimum, self.limit / 2)
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+
+class LatencyStats:
+    """Thread-safe record of request latencies (seconds)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples = []
+
+    def add(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def summary(self):
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return {"count": 0}
+        n = len(samples)
+        return {
+            "count": n,
+            "mean_ms": 1000 * sum(samples) / n,
+            "p50_ms": 1000 * samples[n // 2],
+            "p95_ms": 1000 * samples[min(n - 1, int(n * 0.95))],
+            "max_ms": 1000 * samples[-1],
+        }
+
+
+class TTSProvider:
+    """
+    Base class for speech providers. Subclasses implement synthesize().
+    gtts_fallback: whether a failure may be replaced by gTTS audio.
+    ext: file extension of the audio synthesize() writes.
+    """
+    name = ""
+    gtts_fallback = False
+    ext = ".mp3"
+
+    def __init__(self):
+        self.latency = LatencyStats()
+
+    def synthesize(self, text, lang_code, voice_id, speed, filepath):
+        """Synthesizes text to an audio file at filepath."""
+        raise NotImplementedError
+
+    def list_voices(self):
+        """Returns available voices as plain dicts (name, language_codes, ssml_gender)."""
+        return []
+
+    def note_fallback(self):
+        """Called when a failed request was replaced by gTTS audio."""
+
+    def close(self):
+        """Releases connections. The provider reconnects if used again."""
+
+
+class GTTSProvider(TTSProvider):
+    """
+    Google Translate's free TTS endpoint. One voice per language and normal
+    speed only: voice_id and speed are ignored, the caller changes the tempo.
+    """
+    name = "gTTS"
+
+    def synthesize(self, text, lang_code, voice_id, speed, filepath):
+        tts = gTTS(text=text, lang=lang_code, slow=False)
+        start = time.perf_counter()
+        tts.save(filepath)
+        self.latency.add(time.perf_counter() - start)
+
+
+class GoogleCloudProvider(TTSProvider):
+    """
+    Long-lived Google Cloud TTS clients.
+    Each client holds one gRPC channel, which is safe to share between threads,
+    so the TLS handshake happens once per client instead of once per sentence.
+    Requests are spread round-robin over pool_size clients.
+    """
+    name = "google_cloud"
+    gtts_fallback = True
+
+    def __init__(self, api_key, pool_size=1):
+        super().__init__()
+        self.api_key = api_key
+        self.pool_size = max(1, pool_size)
+        self._clients = []
+        self._next = None
+        self._lock = threading.Lock()
+
+    def _client(self):
+        with self._lock:
+            if not self._clients:
+                options = client_options.ClientOptions(api_key=self.api_key)
+                self._clients = [texttospeech.TextToSpeechClient(client_options=options)
+                                 for _ in range(self.pool_size)]
+                self._next = itertools.cycle(self._clients)
+            return next(self._next)
+
+    def synthesize(self, text, lang_code, voice_id, speed, filepath):
+        """Synthesizes text to an MP3 at filepath."""
+        input_text = texttospeech.SynthesisInput(text=text)
+        # Voice selection
+        voice_params = {"language_code": lang_code}
+
+        if voice_id:
+            voice_params["name"] = voice_id
+            # Fix for Google Cloud strict matching: 'es' != 'es-ES'
+            # If we have a specific voice, we should trust its language code.
+            # Voice IDs are usually "lang-region-voice" (e.g. es-ES-Standard-A)
+            parts = voice_id.split('-')
+            if len(parts) >= 2:
+                voice_params["language_code"] = f"{parts[0]}-{parts[1]}"
+
+        voice = texttospeech.VoiceSelectionParams(**voice_params)
+        audio_config = texttospeech.AudioConfig(
+            audio_encoding=texttospeech.AudioEncoding.MP3,
+            speaking_rate=speed
+        )
+
+        client = self._client()
+        start = time.perf_counter()
+        response = client.synthesize_speech(
+            input=input_text, voice=voice, audio_config=audio_config
+        )
+        self.latency.add(time.perf_counter() - start)
+
+        with open(filepath, "wb") as out:
+            out.write(response.audio_content)
+
+    def list_voices(self):
+        """Returns available voices as plain dicts."""
+        response = self._client().list_voices()
+        voices = []
+        for voice in response.voices:
+            voices.append({
+                "name": voice.name,
+                "language_codes": list(voice.language_codes),
+                "ssml_gender": texttospeech.SsmlVoiceGender(voice.ssml_gender).name
+            })
+        return voices
+
+    def close(self):
+        """Closes every channel. The provider reconnects if used again."""
+        with self._lock:
+            clients, self._clients = self._clients, []
+        for client in clients:
+            try:
+                client.transport.close()
+            except Exception as e:
+                print(f"Error closing TTS client: {e}")
+
+
+class OfflineProvider(TTSProvider):
+    """
+    In-process stand-in for a network TTS service, for load tests without
+    internet access. It writes deterministic tones whose length follows the
+    text (chars_per_second at speed 1.0), after a simulated round trip.
+    latency_ms, jitter_ms: each request sleeps latency_ms +/- jitter_ms.
+    rate_limit: requests per second allowed (token bucket with a one second
+        burst); requests beyond it fail at once with RateLimitError. 0 = no limit.
+    error_rate: fraction of requests that fail with TTSError after the delay.
+    seed: makes jitter and injected errors repeatable.
+    """
+    name = "offline"
+    ext = ".wav"
+    sample_rate = 24000
+
+    def __init__(self, latency_ms=150, jitter_ms=50, rate_limit=0, error_rate=0.0,
+                 chars_per_second=14.0, seed=0):
+        super().__init__()
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.rate_limit = rate_limit
+        self.error_rate = error_rate
+        self.chars_per_second = chars_per_second
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._bucket = TokenBucket(rate_limit)
+        self.requests = 0
+        self.rejected = 0
+        self.failed = 0
+
+    def _admit(self):
+        """Takes a rate limit token and draws this request's delay and outcome."""
+        with self._lock:
+            self.requests += 1
+            if not self._bucket.try_acquire():
+                self.rejected += 1
+                raise RateLimitError(f"Rate limit of {self.rate_limit} requests/s exceeded")
+            delay = max(0.0, self.latency_ms + self._rng.uniform(-self.jitter_ms, self.jitter_ms)) / 1000
+            fail = self._rng.random() < self.error_rate
+            if fail:
+                self.failed += 1
+        return delay, fail
+
+    def synthesize(self, text, lang_code, voice_id, speed, filepath):
+        delay, fail = self._admit()
+        start = time.perf_counter()
+        time.sleep(delay)
+        if fail:
+            raise TTSError("Injected failure (offline provider error_rate)")
+        self._write_tone(text, lang_code, voice_id, speed, filepath)
+        self.latency.add(time.perf_counter() - start)
+
+    def _write_tone(self, text, lang_code, voice_id, speed, filepath):
+        digest = hashlib.sha1(f"{lang_code}|{voice_id}|{text}".encode("utf-8")).digest()
+        frequency = 180 + digest[0] * 2 # 180-690 Hz, fixed per text and voice
+        seconds = 0.2 + len(text) / (self.chars_per_second * speed)
+        t = np.arange(int(seconds * self.sample_rate)) / self.sample_rate
+        # Short fades so clips do not click when placed next to each other
+        envelope = np.minimum(1.0, np.minimum(t, seconds - t) / 0.02)
+        pcm = 0.3 * envelope * np.sin(2 * np.pi * frequency * t)
+        with wave.open(filepath, "wb") as out:
+            out.setnchannels(1)
+            out.setsampwidth(2)
+            out.setframerate(self.sample_rate)
+            out.writeframes((pcm * 32767).astype("<i2").tobytes())
+
+    def list_voices(self):
+        return [{"name": f"{code}-Offline-{variant}", "language_codes": [code], "ssml_gender": gender}
+                for code in ("en-US", "fr-FR", "es-ES", "de-DE", "ja-JP", "zh-CN")
+                for variant, gender in (("A", "FEMALE"), ("B", "MALE"))]
+
+    def stats(self):
+        with self._lock:
+            return {"requests": self.requests, "rejected": self.rejected, "failed": self.failed}
+
+
+class ResilientProvider:
+    """
+    Wraps a network provider so bursts do not turn into failures: requests
+    wait for a token-bucket rate limit (rate_limit per second, 0 = none),
+    in-flight requests follow AdaptiveConcurrency, and throttled or
+    transient failures are retried up to max_retries times with
+    exponential backoff and full jitter. Other errors are raised at once.
+    Everything else is delegated to the wrapped provider.
+    """
+
+    def __init__(self, provider, rate_limit=0, max_concurrency=4, max_retries=4,
+                 base_delay=0.5, max_delay=20.0, seed=None):
+        self.provider = provider
+        self.bucket = TokenBucket(rate_limit)
+        self.concurrency = AdaptiveConcurrency(max_concurrency)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._counters = {"requests": 0, "throttled": 0, "retried": 0, "failed": 0, "fell_back": 0}
+
+    def __getattr__(self, name):
+        return getattr(self.provider, name)
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def _backoff(self, attempt):
+        with self._lock:
+            return self._rng.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def synthesize(self, text, lang_code, voice_id, speed, filepath):
+        attempt = 0
+        while True:
+            self.bucket.acquire()
+            self.concurrency.acquire()
+            self._count("requests")
+            throttled = False
+            try:
+                self.provider.synthesize(text, lang_code, voice_id, speed, filepath)
+                return
+            except Exception as e:
+                throttled = isinstance(e, THROTTLE_ERRORS)
+                if throttled:
+                    self._count("throttled")
+                if not (throttled or isinstance(e, TRANSIENT_ERRORS)) or attempt >= self.max_retries:
+                    self._count("failed")
+                    raise
+                self._count("retried")
+            finally:
+                self.concurrency.release(throttled)
+            time.sleep(self._backoff(attempt))
+            attempt += 1
+
+    def note_fallback(self):
+        self._count("fell_back")
+
+    def counters(self):
+        """requests (attempts), throttled, retried, failed (gave up) and fell_back (replaced by gTTS)."""
+        with self._lock:
+            counters = dict(self._counters)
+        counters["concurrency_limit"] = int(self.concurrency.limit)
+        return counters
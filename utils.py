@@ -1,38 +1,99 @@
-from PIL import ImageFont
+import re
+import weakref
+
+# Characters from scripts written without spaces. A line may break before any of them.
+_NO_SPACE_CHARS = re.compile(
+    "[\u2e80-\u2fff"   # CJK radicals, Kangxi
+    "\u3040-\u30ff"    # Hiragana, Katakana
+    "\u3100-\u312f\u31a0-\u31ff"  # Bopomofo, Katakana extensions
+    "\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff"  # CJK ideographs
+    "\U00020000-\U0002fa1f]"
+)
+# Punctuation that must not start a line; it stays with the character before it
+_NO_LINE_START = set("、。，．・：；？！ー」』）】〕〉》〟’”ゝゞ々ぁぃぅぇぉっゃゅょァィゥェォッャュョ,.!?:;)]}")
+
+# font -> {token: advance width}. Fonts are cached by fonts.get_font, so this
+# survives across slides; it is dropped when a font object goes away.
+_advance_cache = weakref.WeakKeyDictionary()
+_ADVANCE_CACHE_LIMIT = 50000
+
+
+def _advance(font, token):
+    widths = _advance_cache.get(font)
+    if widths is None:
+        widths = _advance_cache.setdefault(font, {})
+    width = widths.get(token)
+    if width is None:
+        if len(widths) > _ADVANCE_CACHE_LIMIT:
+            widths.clear()
+        width = widths[token] = font.getlength(token)
+    return width
+
+
+def _tokens(text):
+    """
+    Splits text into (token, space_before) pieces a line may break between.
+    Words are split on whitespace; CJK text is split further into characters.
+    """
+    tokens = []
+    for word in text.split():
+        if not _NO_SPACE_CHARS.search(word):
+            tokens.append((word, True))
+            continue
+        pieces = []
+        run = ""
+        for ch in word:
+            if ch in _NO_LINE_START and pieces and not run:
+                pieces[-1] += ch
+            elif _NO_SPACE_CHARS.match(ch):
+                if run:
+                    pieces.append(run)
+                    run = ""
+                pieces.append(ch)
+            else:
+                run += ch
+        if run:
+            pieces.append(run)
+        tokens.append((pieces[0], True))
+        tokens.extend((piece, False) for piece in pieces[1:])
+    return tokens
+
+
+def wrap_text_with_widths(text, font, max_width):
+    """
+    Wraps text to fit within a maximum width.
+    Returns a list of (line, width) tuples.
+    Word widths are cached per font, so each line costs one measurement.
+    """
+    lines = []
+    space = _advance(font, ' ')
+    current = ""
+    current_width = 0
+
+    for token, space_before in _tokens(text):
+        token_width = _advance(font, token)
+        gap = space if (space_before and current) else 0
+        if current and current_width + gap + token_width > max_width:
+            lines.append(current)
+            current, current_width = token, token_width
+        else:
+            # A single token wider than the line is kept as is
+            current += (' ' if gap else '') + token
+            current_width += gap + token_width
+
+    if current:
+        lines.append(current)
+
+    # Measure each finished line once, which also accounts for kerning
+    return [(line, font.getlength(line)) for line in lines]
+
 
 def wrap_text(text, font, max_width):
     """
     Wraps text to fit within a maximum width.
     Returns a list of lines.
     """
-    lines = []
-    # simplistic split by words
-    words = text.split()
-    current_line = []
-    
-    for word in words:
-        current_line.append(word)
-        # Check width of current line
-        temp_line = ' '.join(current_line)
-        bbox = font.getbbox(temp_line)
-        # getbbox returns (left, top, right, bottom)
-        width = bbox[2] - bbox[0]
-        
-        if width > max_width:
-            if len(current_line) == 1:
-                # If a single word is too long, we keep it (or could split chars)
-                lines.append(temp_line)
-                current_line = []
-            else:
-                # Pop the last word and add the line
-                current_line.pop()
-                lines.append(' '.join(current_line))
-                current_line = [word]
-    
-    if current_line:
-        lines.append(' '.join(current_line))
-        
-    return lines
+    return [line for line, width in wrap_text_with_widths(text, font, max_width)]
 
 LANG_MAP = {
     'Auto': 'auto',
@@ -49,4 +110,9 @@ LANG_MAP = {
 }
 
 def get_language_code(lang_name):
-    return LANG_MAP.get(lang_name, 'en')
+    if lang_name in LANG_MAP:
+        return LANG_MAP[lang_name]
+    # Already a code, e.g. a detected language like 'nl' or 'zh-cn'
+    if lang_name and lang_name == lang_name.lower():
+        return lang_name
+    return 'en'
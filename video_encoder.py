@@ -0,0 +1,280 @@
+import bisect
+import contextlib
+import hashlib
+import json
+import math
+import os
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import numpy as np
+from PIL import Image
+from moviepy import VideoClip
+from moviepy.config import FFMPEG_BINARY
+from audio_cache import AudioCache, default_cache_dir
+
+FPS = 24
+
+# x264 settings for slides: every frame of a slide is the same picture.
+# No B-frames: with them and variable frame rate, an MP4 of several slides
+# reports a shorter duration than its frames span, and the concat demuxer
+# then starts the next segment too early (see encode_chunks).
+STILL_IMAGE_ARGS = [
+    "-c:v", "libx264",
+    "-preset", "medium",
+    "-tune", "stillimage",
+    "-bf", "0",
+    "-pix_fmt", "yuv420p",
+]
+
+
+def quantize_duration(seconds, fps=FPS):
+    """Rounds a slide duration up to a whole number of frames."""
+    return math.ceil(round(seconds * fps, 6)) / fps
+
+
+def _quote(path):
+    # Concat demuxer syntax: single-quoted, with ' written as '\''
+    return "'" + os.path.abspath(path).replace("'", "'\\''") + "'"
+
+
+def write_concat_list(list_path, slides, fps=FPS):
+    """
+    Writes an ffmpeg concat demuxer script showing each image for its duration.
+    slides: list of (image_path, seconds).
+    """
+    with open(list_path, "w", encoding="utf-8") as f:
+        f.write("ffconcat version 1.0\n")
+        for image_path, duration in slides:
+            f.write(f"file {_quote(image_path)}\n")
+            # Without this, image timestamps are rounded to 1/25 s
+            f.write(f"option framerate {fps}\n")
+            f.write(f"duration {duration:.6f}\n")
+        # The demuxer ignores the last duration unless the file is repeated
+        if slides:
+            f.write(f"file {_quote(slides[-1][0])}\n")
+            f.write(f"option framerate {fps}\n")
+
+
+def run_ffmpeg(args):
+    """Runs ffmpeg, raising RuntimeError with its log if it fails."""
+    cmd = [FFMPEG_BINARY, "-y", "-hide_banner", "-loglevel", "error"] + args
+    result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed: {result.stderr.decode(errors='replace').strip()}")
+
+
+def slide_timing_args(slides, fps=FPS, constant_frame_rate=False):
+    """
+    ffmpeg output options for still slides: the frame timing, and one
+    keyframe at the start of every slide and none in between.
+    slides: list of (image_path, seconds) in whole frames.
+    """
+    # Work in whole frames: summing float seconds and printing them rounds
+    # some k/fps boundaries up, past the frame, and ffmpeg then forces the
+    # keyframe on the slide's second frame (or not at all). Asking for half a
+    # frame early lands on the slide's first frame whatever the rounding.
+    keyframes = []
+    frames = 0
+    for image_path, duration in slides:
+        keyframes.append("0" if frames == 0 else f"{(frames - 0.5) / fps:.6f}")
+        frames += round(duration * fps)
+
+    if constant_frame_rate:
+        timing = ["-vf", f"fps={fps}", "-t", f"{frames / fps:.6f}"]
+    else:
+        timing = ["-fps_mode", "vfr"]
+    return timing + ["-force_key_frames", ",".join(keyframes)]
+
+
+def encode_slideshow(slides, audio_path, output_path, work_dir, fps=FPS, constant_frame_rate=False):
+    """
+    Encodes still slides and one finished audio track in a single ffmpeg pass.
+    slides: list of (image_path, seconds); durations should be whole frames
+    (see quantize_duration) so every slide starts exactly on a keyframe.
+    By default each slide is stored as a single frame held for its duration
+    (variable frame rate), so the encoder only sees one picture per slide.
+    constant_frame_rate repeats frames at fps instead, for players that need it.
+    """
+    list_path = os.path.join(work_dir, "slides.ffconcat")
+    write_concat_list(list_path, slides, fps)
+
+    run_ffmpeg([
+        "-f", "concat", "-safe", "0", "-i", list_path,
+        "-i", audio_path,
+        "-map", "0:v", "-map", "1:a",
+        *slide_timing_args(slides, fps, constant_frame_rate),
+        *STILL_IMAGE_ARGS,
+        "-c:a", "aac", "-b:a", "192k",
+        "-movflags", "+faststart",
+        output_path,
+    ])
+
+
+def streaming_slides_clip(slides):
+    """
+    A moviepy clip showing each image for its duration, for the moviepy
+    engine. Unlike a concatenation of ImageClips it holds one decoded slide
+    at a time and no open files, so memory stays flat however long the deck.
+    Frames must be requested in order (as write_videofile does) for that;
+    going back only costs a reload.
+    slides: list of (image_path, seconds).
+    """
+    starts = []
+    t = 0.0
+    for image_path, duration in slides:
+        starts.append(t)
+        t += duration
+    current = {"index": None, "frame": None}
+
+    def frame_at(t):
+        i = min(max(bisect.bisect_right(starts, t) - 1, 0), len(slides) - 1)
+        if current["index"] != i:
+            with Image.open(slides[i][0]) as img:
+                current["frame"] = np.asarray(img.convert("RGB"))
+            current["index"] = i
+        return current["frame"]
+
+    return VideoClip(frame_at, duration=t)
+
+
+class SegmentCache(AudioCache):
+    """
+    Encoded per-slide video segments, stored and evicted like cached audio:
+    a run's segments stay until it has stitched them, then trim() runs.
+    """
+
+    def __init__(self, cache_dir=None, max_mb=2000):
+        super().__init__(cache_dir or default_segment_dir(), max_mb)
+
+
+def default_segment_dir():
+    return os.path.join(os.path.dirname(default_cache_dir()), "segments")
+
+
+def segment_fingerprint(style, text1, text2, duration, fps=FPS, constant_frame_rate=False, bg_mtime=None):
+    """
+    Identifies a slide's encoded segment. Segments are video only (the audio
+    track is muxed in when they are joined), so audio enters only through the
+    slide's duration. The style only names the background image, so its
+    bg_mtime is part of the key too: editing the image in place re-encodes.
+    """
+    payload = json.dumps([list(style), text1, text2, round(duration, 6), fps,
+                          constant_frame_rate, STILL_IMAGE_ARGS, bg_mtime], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def encode_segment(image_path, duration, output_path, fps=FPS, constant_frame_rate=False, threads=0):
+    """
+    Encodes one slide as a self-contained, video-only segment lasting exactly
+    duration seconds (a whole number of frames), starting on a keyframe.
+    """
+    encode_chunk([(image_path, duration)], output_path, fps, constant_frame_rate, threads)
+
+
+def encode_chunk(slides, output_path, fps=FPS, constant_frame_rate=False, threads=0):
+    """
+    Encodes consecutive slides as one self-contained, video-only segment
+    lasting exactly their total duration, with a keyframe at every slide.
+    slides: list of (image_path, seconds) in whole frames.
+    threads: x264 threads (0 = ffmpeg's default of one per core).
+    """
+    # A second copy of the last image one frame before the end pins the
+    # segment's length, which is what the concat demuxer uses to place the
+    # next segment.
+    last_image, last_duration = slides[-1]
+    held = slides[:-1] + [(last_image, max(last_duration - 1 / fps, 1 / fps))]
+    list_path = output_path + ".ffconcat"
+    write_concat_list(list_path, held, fps)
+
+    try:
+        run_ffmpeg([
+            "-f", "concat", "-safe", "0", "-i", list_path,
+            *slide_timing_args(slides, fps, constant_frame_rate),
+            *STILL_IMAGE_ARGS,
+            *(["-threads", str(threads)] if threads else []),
+            "-an",
+            output_path,
+        ])
+    finally:
+        os.remove(list_path)
+
+
+def chunk_ranges(durations, rows=0, seconds=0):
+    """
+    Splits slides into consecutive chunks of at most rows slides and, once a
+    chunk reaches seconds, ends it at that slide. Returns [(start, end)]
+    index ranges; with neither limit the whole deck is one chunk.
+    """
+    ranges = []
+    start = 0
+    length = 0.0
+    for i, duration in enumerate(durations):
+        length += duration
+        if (rows and i + 1 - start >= rows) or (seconds and length >= seconds):
+            ranges.append((start, i + 1))
+            start, length = i + 1, 0.0
+    if start < len(durations):
+        ranges.append((start, len(durations)))
+    return ranges
+
+
+def encoder_threads(workers):
+    """x264 threads per encode when workers encodes run at once, so they share the cores."""
+    if workers <= 1:
+        return 0
+    return max(1, (os.cpu_count() or 1) // workers)
+
+
+def encode_chunks(slides, ranges, work_dir, workers=0, fps=FPS, constant_frame_rate=False, tracer=None,
+                  progress_callback=None):
+    """
+    Encodes each range of slides (see chunk_ranges) as its own video-only
+    segment, up to workers ffmpeg processes at a time (0 = one per CPU core).
+    Returns the segment paths in range order; concat_segments joins them
+    without re-encoding.
+    """
+    workers = min(workers or os.cpu_count() or 1, len(ranges))
+    threads = encoder_threads(workers)
+    paths = [os.path.join(work_dir, f"chunk_{n}.mp4") for n in range(len(ranges))]
+
+    def encode(n):
+        start, end = ranges[n]
+        span = tracer.span("encode_chunk", "chunk", chunk=n, slides=end - start) if tracer else contextlib.nullcontext()
+        with span:
+            encode_chunk(slides[start:end], paths[n], fps, constant_frame_rate, threads)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = [pool.submit(encode, n) for n in range(len(ranges))]
+        for done, future in enumerate(as_completed(futures), 1):
+            future.result()
+            if progress_callback:
+                progress_callback(done, len(ranges))
+    return paths
+
+
+def concat_segments(segment_paths, audio_path, output_path, work_dir, audio_start=0.0, audio_duration=None):
+    """
+    Joins encoded segments without re-encoding them and adds the audio track,
+    or the audio_duration seconds of it from audio_start.
+    """
+    list_path = os.path.join(work_dir, "segments.ffconcat")
+    with open(list_path, "w", encoding="utf-8") as f:
+        f.write("ffconcat version 1.0\n")
+        for path in segment_paths:
+            f.write(f"file {_quote(path)}\n")
+
+    audio_range = []
+    if audio_start:
+        audio_range += ["-ss", f"{audio_start:.6f}"]
+    if audio_duration is not None:
+        audio_range += ["-t", f"{audio_duration:.6f}"]
+
+    run_ffmpeg([
+        "-f", "concat", "-safe", "0", "-i", list_path,
+        *audio_range, "-i", audio_path,
+        "-map", "0:v", "-map", "1:a",
+        "-c:v", "copy",
+        "-c:a", "aac", "-b:a", "192k",
+        "-movflags", "+faststart",
+        output_path,
+    ])
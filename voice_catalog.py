@@ -0,0 +1,112 @@
+import json
+import os
+import threading
+import time
+import uuid
+from audio_cache import default_cache_dir
+
+DEFAULT_TTL_HOURS = 24
+
+
+def default_catalog_path():
+    return os.path.join(os.path.dirname(default_cache_dir()), "voices.json")
+
+
+class VoiceCatalog:
+    """
+    Google voice list kept on disk, so the app can show voices at start-up
+    without a network call and refresh them in the background once the copy
+    is older than ttl_hours.
+    Voices are indexed by every prefix of their language codes, so
+    voices_for("en") finds "en-US" and "en-GB" voices without a scan.
+    """
+
+    def __init__(self, path=None, ttl_hours=DEFAULT_TTL_HOURS):
+        self.path = path or default_catalog_path()
+        self.ttl_hours = ttl_hours
+        self.fetched_at = None
+        self._voices = []
+        self._index = {}
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+    def __len__(self):
+        with self._lock:
+            return len(self._voices)
+
+    def load(self):
+        """Reads the on-disk copy. Returns False if there is none (or it is unreadable)."""
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+            self._set(data["voices"], data["fetched_at"])
+            return True
+        except (OSError, ValueError, KeyError) as e:
+            if not isinstance(e, FileNotFoundError):
+                print(f"Ignoring unreadable voice catalog {self.path}: {e}")
+            return False
+
+    def is_stale(self):
+        with self._lock:
+            fetched_at = self.fetched_at
+        return fetched_at is None or time.time() - fetched_at > self.ttl_hours * 3600
+
+    def update(self, voices):
+        """Replaces the catalog with freshly fetched voices and saves it."""
+        fetched_at = time.time()
+        self._set(voices, fetched_at)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump({"fetched_at": fetched_at, "voices": voices}, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Could not save voice catalog: {e}")
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def refresh_async(self, fetch_voices, on_done=None):
+        """
+        Calls fetch_voices() on a background thread and updates the catalog if
+        it returned any voices. on_done(voices) is then called on that thread.
+        Returns False (and does nothing) if a refresh is already running.
+        """
+        with self._lock:
+            if self._refreshing:
+                return False
+            self._refreshing = True
+
+        def run():
+            voices = []
+            try:
+                voices = fetch_voices()
+                if voices:
+                    self.update(voices)
+            except Exception as e:
+                print(f"Error refreshing voices: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing = False
+            if on_done:
+                on_done(voices)
+
+        threading.Thread(target=run, daemon=True).start()
+        return True
+
+    def voices_for(self, lang_code):
+        """Voices with a language code starting with lang_code, e.g. 'en' -> en-US, en-GB, ..."""
+        with self._lock:
+            return list(self._index.get(lang_code, ()))
+
+    def _set(self, voices, fetched_at):
+        index = {}
+        for voice in voices:
+            prefixes = {code[:i] for code in voice["language_codes"] for i in range(1, len(code) + 1)}
+            for prefix in prefixes:
+                index.setdefault(prefix, []).append(voice)
+        with self._lock:
+            self._voices = list(voices)
+            self._index = index
+            self.fetched_at = fetched_at
@@ -0,0 +1,170 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+PREFIX = "slideshow_"
+# RAM-backed directories tried for intermediates before the regular temp dir
+TMPFS_DIRS = ("/dev/shm",)
+# Room a workspace must leave free on tmpfs, beyond its own expected size
+TMPFS_MIN_FREE_MB = 1024
+MB = 1024 * 1024
+KEEP_MARKER = ".keep"
+
+
+class WorkspaceFullError(RuntimeError):
+    """The workspace grew past its quota."""
+
+
+def _writable_dir(path):
+    return os.path.isdir(path) and os.access(path, os.W_OK | os.X_OK)
+
+
+def pick_base_dir(root=None, use_tmpfs=True, quota_mb=0, expected_bytes=None):
+    """
+    Where a new workspace goes: root if given, else a tmpfs that can hold it
+    with TMPFS_MIN_FREE_MB to spare, else the system temp dir. The workspace's
+    size is its quota if it has one, else expected_bytes; when neither is
+    known tmpfs is not used, since a large deck could fill RAM.
+    """
+    if root:
+        os.makedirs(root, exist_ok=True)
+        return root
+    size = quota_mb * MB if quota_mb else expected_bytes
+    if use_tmpfs and size is not None:
+        needed = size + TMPFS_MIN_FREE_MB * MB
+        for path in TMPFS_DIRS:
+            if _writable_dir(path) and shutil.disk_usage(path).free >= needed:
+                return path
+    return tempfile.gettempdir()
+
+
+def sweep_stale(base_dir, max_age_hours=24):
+    """
+    Removes workspaces left behind by crashed runs: our directories in
+    base_dir untouched for max_age_hours, unless kept with keep_artifacts.
+    """
+    cutoff = time.time() - max_age_hours * 3600
+    try:
+        names = os.listdir(base_dir)
+    except OSError:
+        return
+    for name in names:
+        path = os.path.join(base_dir, name)
+        if not name.startswith(PREFIX) or not os.path.isdir(path):
+            continue
+        try:
+            if os.path.exists(os.path.join(path, KEEP_MARKER)) or os.path.getmtime(path) > cutoff:
+                continue
+        except OSError:
+            continue
+        shutil.rmtree(path, ignore_errors=True)
+
+
+class Workspace:
+    """
+    Scratch directory for one generator's intermediates (slide PNGs, raw
+    audio, the assembled track, ffmpeg lists).
+    The directory is created on first use, cleared after each run by clear()
+    and removed by cleanup(). With keep_artifacts both leave files in place
+    for debugging. quota_mb (0 = unlimited) is enforced by check_quota(),
+    which callers run between stages. Callers size each run with expect(),
+    which decides whether it may use tmpfs.
+    """
+
+    def __init__(self, root=None, quota_mb=0, use_tmpfs=True, keep_artifacts=False):
+        self.root = root
+        self.quota_mb = quota_mb
+        self.use_tmpfs = use_tmpfs
+        self.keep_artifacts = keep_artifacts
+        self.expected_bytes = None
+        self._path = None
+        self._lock = threading.Lock()
+
+    @property
+    def path(self):
+        with self._lock:
+            if self._path is not None and not os.path.isdir(self._path):
+                # Swept while idle (see sweep_stale); start a fresh one
+                self._path = None
+            if self._path is None:
+                base = pick_base_dir(self.root, self.use_tmpfs, self.quota_mb, self.expected_bytes)
+                sweep_stale(base)
+                self._path = tempfile.mkdtemp(prefix=PREFIX, dir=base)
+                if self.keep_artifacts:
+                    open(os.path.join(self._path, KEEP_MARKER), "w").close()
+            return self._path
+
+    def expect(self, expected_bytes):
+        """
+        Sizes the next run (None = unknown). If the directory is in the wrong
+        place for it (e.g. on tmpfs, which it would not fit) and empty, it is
+        dropped and recreated in the right place on first use.
+        """
+        with self._lock:
+            self.expected_bytes = expected_bytes
+            path = self._path
+            if path is None or self.keep_artifacts:
+                return
+            if os.path.dirname(path) != pick_base_dir(self.root, self.use_tmpfs, self.quota_mb, expected_bytes):
+                try:
+                    os.rmdir(path) # only if empty
+                except OSError:
+                    return
+                self._path = None
+
+    def file(self, name):
+        return os.path.join(self.path, name)
+
+    def usage(self):
+        """Bytes currently used by the workspace."""
+        with self._lock:
+            path = self._path
+        if path is None:
+            return 0
+        total = 0
+        for root, dirs, files in os.walk(path):
+            for filename in files:
+                try:
+                    total += os.path.getsize(os.path.join(root, filename))
+                except OSError:
+                    pass
+        return total
+
+    def check_quota(self, stage=""):
+        """Raises WorkspaceFullError if the workspace is over its quota."""
+        if not self.quota_mb:
+            return
+        used = self.usage()
+        if used > self.quota_mb * 1024 * 1024:
+            where = f" after {stage}" if stage else ""
+            raise WorkspaceFullError(f"Workspace {self._path} uses {used / 1024 / 1024:.0f} MB{where}, "
+                                     f"over its {self.quota_mb} MB quota")
+
+    def clear(self):
+        """Deletes the workspace's contents but keeps the directory for the next run."""
+        with self._lock:
+            path = self._path
+        if path is None or self.keep_artifacts or not os.path.isdir(path):
+            return
+        for name in os.listdir(path):
+            full = os.path.join(path, name)
+            if os.path.isdir(full):
+                shutil.rmtree(full, ignore_errors=True)
+            else:
+                try:
+                    os.remove(full)
+                except OSError:
+                    pass
+
+    def cleanup(self):
+        """Removes the workspace directory. It is recreated if used again."""
+        with self._lock:
+            path, self._path = self._path, None
+        if path is None:
+            return
+        if self.keep_artifacts:
+            print(f"Keeping intermediate files in {path}")
+            return
+        shutil.rmtree(path, ignore_errors=True)